@@ -4,23 +4,44 @@ for weather, air quality, attractions, and recommendations.
 """
 
 import os
+import asyncio
+import hashlib
+import json
+import time
+import traceback
 from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
-from langchain_core.tools import tool
-from config import OPENAI_API_KEY
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool, StructuredTool
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+from openai import RateLimitError
+from config import (
+    OPENAI_API_KEY,
+    AGENT_TOOL_CONCURRENCY,
+    AGENT_COMPACT_TOOLS,
+    AGENT_BATCH_CONCURRENCY,
+    AGENT_CITY_TIMEOUT,
+    AGENT_RESPONSE_CACHE,
+    AGENT_RESPONSE_CACHE_PATH,
+    AGENT_RESPONSE_CACHE_TTL,
+)
+import ratelimit
+from cache import ResponseCache, normalize_address
+from compact import compact_output, tool_token_stats, canonical_evidence
+from runmemo import run_memo, memoized_call
 from tools import (
     geocode_location,
-    get_weather,
-    get_air_quality,
-    get_owm_forecast,
-    get_owm_air_quality,
+    get_daily_forecast,
+    fetch_aqi,
     clothing_recommendation,
     umbrella_needed,
     mask_needed,
     get_attractions,
-    three_day_summary,
     aqi_category,
-    extract_aqi,
+    fetch_city_bundle,
+    travel_advice,
 )
 
 from datetime import datetime
@@ -29,8 +50,6 @@ load_dotenv(override=True)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-OPENWEATHER_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")  #
-
 # Define tools for the agent
 @tool
 def get_location_coordinates(city: str) -> dict:
@@ -60,14 +79,10 @@ def get_weather_forecast(lat: float, lng: float) -> dict:
         Dictionary containing weather forecast data
     """
     try:
-        if OPENWEATHER_API_KEY:
-            owm_daily = get_owm_forecast(lat, lng)
-            if owm_daily:
-                return {"daily": owm_daily, "source": "OpenWeatherMap"}
-        
-        # Fallback to Google Weather API
-        weather = get_weather(lat, lng)
-        daily = three_day_summary(weather)
+        # OpenWeatherMap when configured, Google Weather as the (hedged) fallback
+        daily, weather = get_daily_forecast(lat, lng)
+        if weather is None:
+            return {"daily": daily, "source": "OpenWeatherMap"}
         return {"daily": daily, "source": "Google Weather", "raw": weather}
     except Exception as e:
         return {"error": str(e), "daily": [{"high": None, "low": None, "precip": 0}] * 3}
@@ -85,31 +100,16 @@ def get_air_quality_data(lat: float, lng: float) -> dict:
         Dictionary with AQI value and category
     """
     try:
-        aqi = None
-        
-        # Try OpenWeatherMap first if available
-        if OPENWEATHER_API_KEY:
-            owm_aq = get_owm_air_quality(lat, lng)
-            if owm_aq:
-                aqi = owm_aq.get("aqi_estimate") or owm_aq.get("owm_index")
-                if aqi:
-                    return {
-                        "aqi": aqi,
-                        "category": aqi_category(aqi),
-                        "source": "OpenWeatherMap"
-                    }
-        
-        # Fallback to Google Air Quality API
-        air = get_air_quality(lat, lng)
-        aqi = extract_aqi(air)
-        
+        # OpenWeatherMap when configured, Google Air Quality as the (hedged) fallback
+        aqi, source = fetch_aqi(lat, lng)
+
         if aqi is None:
             return {"aqi": None, "category": "Unknown", "error": "Could not extract AQI from response"}
         
         return {
             "aqi": aqi,
             "category": aqi_category(aqi),
-            "source": "Google Air Quality"
+            "source": source
         }
     except Exception as e:
         return {"error": str(e), "aqi": None, "category": "Unknown"}
@@ -173,33 +173,44 @@ def check_mask_needed(aqi_value: int) -> bool:
     return mask_needed(aqi_value)
 
 
-# Create the agent
-def create_travel_agent():
-    """Create and configure the travel planning agent."""
-    
-    # Initialize the LLM
-    llm = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0.7,
-        api_key=OPENAI_API_KEY
-    )
+@tool
+def get_city_travel_bundle(city: str) -> dict:
+    """Get everything needed for a city's travel plan in one call.
     
-    # Define the tools
-    tools = [
-        get_location_coordinates,
-        get_weather_forecast,
-        get_air_quality_data,
-        get_tourist_attractions,
-        get_clothing_advice,
-        check_umbrella_needed,
-        check_mask_needed,
-    ]
+    Geocodes the city, fetches the 3-day forecast, air quality and nearby
+    attractions concurrently, and computes clothing, umbrella and mask advice.
     
-    # Create the agent using the new API
-    agent_executor = create_agent(
-        llm,
-        tools=tools,
-        system_prompt="""You are a helpful travel planning assistant. You have access to tools to:
+    Args:
+        city: Name of the city to plan for
+        
+    Returns:
+        Dictionary with address, lat, lng, daily forecast, AQI and category,
+        attractions, average high temperature, clothing, umbrella and mask
+    """
+    try:
+        data = fetch_city_bundle(city, radius_km=5)
+    except Exception as e:
+        return {"error": str(e), "city": city}
+
+    advice = travel_advice(data["daily"], data["aqi"])
+    return {
+        "city": city,
+        "address": data["address"],
+        "lat": data["lat"],
+        "lng": data["lng"],
+        "daily": data["daily"],
+        "weather_source": "OpenWeatherMap" if data["weather"] is None else "Google Weather",
+        "aqi": data["aqi"],
+        "aqi_category": aqi_category(data["aqi"]),
+        "attractions": data["attractions"],
+        "avg_high_c": advice["avg_high"],
+        "clothing": advice["clothing"],
+        "umbrella": advice["umbrella"],
+        "mask": advice["mask"],
+    }
+
+
+TOOLS_PROMPT = """You are a helpful travel planning assistant. You have access to tools to:
 - Get location coordinates for cities
 - Fetch weather forecasts  
 - Check air quality (AQI)
@@ -216,31 +227,230 @@ When a user asks about a city, you MUST:
 6. Check if umbrella is needed based on precipitation
 7. Check if mask is needed based on AQI
 
-Always call ALL these tools to provide a complete travel plan. Be thorough and organized in your response.""",
-        debug=True
+Steps 2-4 only need the coordinates, so request all three in the same turn;
+likewise request steps 5-7 together once you have the weather and AQI.
+Tool calls made in the same turn run in parallel.
+
+Always call ALL these tools to provide a complete travel plan. Be thorough and organized in your response."""
+
+BUNDLE_PROMPT = """You are a helpful travel planning assistant.
+
+When a user asks about a city, call get_city_travel_bundle exactly once for that city.
+It returns the coordinates and address, 3-day weather forecast, air quality (AQI and
+category), nearby attractions, and the clothing, umbrella and mask advice already
+computed. Do not call it again for the same city.
+
+Then write a complete, well-organized travel plan from that result. Be thorough and organized in your response."""
+
+# mode -> (tools, system prompt). "tools" is the original one-tool-per-step
+# flow; "bundle" gathers a city in a single tool call (about 2 LLM turns).
+AGENT_MODES = {
+    "tools": (
+        [
+            get_location_coordinates,
+            get_weather_forecast,
+            get_air_quality_data,
+            get_tourist_attractions,
+            get_clothing_advice,
+            check_umbrella_needed,
+            check_mask_needed,
+        ],
+        TOOLS_PROMPT,
+    ),
+    "bundle": ([get_city_travel_bundle], BUNDLE_PROMPT),
+}
+
+
+def is_error_output(value):
+    """Tools report failures as {"error": ...} payloads (or [{"error": ...}])."""
+    if isinstance(value, list):
+        return any(isinstance(v, dict) and "error" in v for v in value)
+    return isinstance(value, dict) and "error" in value
+
+
+class _ErrorOutput(Exception):
+    """Carries an error payload past the run memo, which does not keep failures."""
+
+    def __init__(self, output):
+        super().__init__()
+        self.output = output
+
+
+def wrap_tool(agent_tool, compact=AGENT_COMPACT_TOOLS):
+    """Route a tool through the per-run memo (runmemo.py) and, when `compact`
+    is set, return its compact, token-budgeted output (compact.py).
+
+    Error payloads are returned to the model but not memoized, so a retry
+    after a transient failure calls the provider again.
+    """
+    def call(kwargs):
+        output = agent_tool.func(**kwargs)
+        rendered = compact_output(agent_tool.name, output) if compact else output
+        if is_error_output(output):
+            raise _ErrorOutput(rendered)
+        return rendered
+
+    def run(**kwargs):
+        try:
+            return memoized_call(agent_tool.name, kwargs, lambda: call(kwargs))
+        except _ErrorOutput as e:
+            return e.output
+
+    return StructuredTool.from_function(
+        func=run,
+        name=agent_tool.name,
+        description=agent_tool.description,
+        args_schema=agent_tool.args_schema,
     )
+
+
+class ProviderRateLimiter(BaseRateLimiter):
+    """Expose a ratelimit.py bucket through LangChain's rate limiter interface."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.bucket.try_acquire()
+        self.bucket.acquire()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.bucket.try_acquire()
+        await self.bucket.aacquire()
+        return True
+
+
+class RateLimitFeedback(BaseCallbackHandler):
+    """Feed OpenAI 429s and successes back into the bucket so it can adapt."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def on_llm_end(self, response, **kwargs):
+        self.bucket.on_success()
+
+    def on_llm_error(self, error, **kwargs):
+        if isinstance(error, RateLimitError):
+            headers = getattr(error.response, "headers", {}) or {}
+            self.bucket.on_throttle(ratelimit.parse_retry_after(headers.get("retry-after")))
+
+
+response_cache = ResponseCache(AGENT_RESPONSE_CACHE_PATH, AGENT_RESPONSE_CACHE_TTL)
+
+
+class ResponseCacheMiddleware(AgentMiddleware):
+    """Reuse the final answer when the model, prompt and tool evidence are unchanged.
+    
+    The key hashes the model name, system prompt, normalized user text and the
+    canonical tool results (compact.canonical_evidence), so the same city with
+    the same forecast, AQI and attractions skips the generation step. Only
+    calls that already have tool results are looked up, and only answers
+    without further tool calls are stored, so a hit ends the run. Misses
+    are counted per final answer, not per intermediate model call.
+    """
+    
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+    
+    def _key(self, request):
+        evidence = sorted(
+            canonical_evidence(m.name, m.content) for m in request.messages if isinstance(m, ToolMessage)
+        )
+        if not evidence:
+            return None
+        prompts = [
+            normalize_address(m.content) for m in request.messages
+            if isinstance(m, HumanMessage) and isinstance(m.content, str)
+        ]
+        model = getattr(request.model, "model_name", None) or type(request.model).__name__
+        system = request.system_message.content if request.system_message is not None else ""
+        payload = json.dumps([model, system, prompts, evidence], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _cached(self, key):
+        content = self.cache.get(key) if key is not None else None
+        if content is None:
+            return None
+        return AIMessage(content=content, response_metadata={"response_cache": "hit"})
     
-    return agent_executor
+    def _store(self, key, response):
+        """Store a final answer; only such answers count as cache misses."""
+        if key is None or not response.result:
+            return
+        message = response.result[-1]
+        if isinstance(message, AIMessage) and not message.tool_calls and isinstance(message.content, str) and message.content:
+            self.cache.record_miss()
+            self.cache.put(key, message.content)
+    
+    def wrap_model_call(self, request, handler):
+        key = self._key(request)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        response = handler(request)
+        self._store(key, response)
+        return response
+    
+    async def awrap_model_call(self, request, handler):
+        key = self._key(request)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        response = await handler(request)
+        self._store(key, response)
+        return response
 
 
-def run_agent_planner(cities: list):
-    """Run the agent-based travel planner for multiple cities.
+# Create the agent
+def create_travel_agent(mode: str = "tools", max_tool_concurrency: int = AGENT_TOOL_CONCURRENCY,
+                        compact: bool = AGENT_COMPACT_TOOLS, debug: bool = True,
+                        cache_responses: bool = AGENT_RESPONSE_CACHE):
+    """Create and configure the travel planning agent.
     
     Args:
-        cities: List of city names to plan for
+        mode: "tools" for the step-by-step tool flow, "bundle" for the single
+            composite get_city_travel_bundle tool
+        max_tool_concurrency: Max tool calls of one model turn that run at once
+        compact: Send the model compact, token-budgeted tool outputs
+        debug: Print every graph step (too noisy for batch runs)
+        cache_responses: Reuse final answers for unchanged tool evidence
     """
-    agent = create_travel_agent()
     
-    print("\n" + "=" * 60)
-    print("AGENTIC TRAVEL PLANNER")
-    print("=" * 60 + "\n")
+    # Initialize the LLM (shares the "openai" bucket with any other OpenAI calls)
+    openai_bucket = ratelimit.buckets["openai"]
+    llm = ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0.7,
+        api_key=OPENAI_API_KEY,
+        rate_limiter=ProviderRateLimiter(openai_bucket),
+        callbacks=[RateLimitFeedback(openai_bucket)],
+    )
     
-    for city in cities:
-        print(f"\n{'=' * 60}")
-        print(f"Planning trip to: {city}")
-        print(f"{'=' * 60}\n")
-        
-        query = f"""Please provide a complete travel plan for {city}. 
+    # Pick the tools and prompt for the requested mode
+    tools, system_prompt = AGENT_MODES[mode]
+    tools = [wrap_tool(t, compact) for t in tools]
+    
+    # Create the agent using the new API
+    agent_executor = create_agent(
+        llm,
+        tools=tools,
+        system_prompt=system_prompt,
+        middleware=[ResponseCacheMiddleware(response_cache)] if cache_responses else [],
+        debug=debug
+    )
+    
+    # Each tool call of a turn is its own graph task; LangGraph runs them on a
+    # thread pool sized by max_concurrency, so independent lookups overlap.
+    return agent_executor.with_config({"max_concurrency": max_tool_concurrency})
+
+
+def city_query(city: str) -> str:
+    """Build the user message that asks the agent for one city's plan."""
+    return f"""Please provide a complete travel plan for {city}. 
         
 I need:
 1. Location coordinates and address
@@ -252,9 +462,107 @@ I need:
 7. Whether I should wear a mask based on air quality
 
 Please use ALL the available tools to gather this information."""
+
+
+def print_run_stats(compact: bool, cache_responses: bool):
+    """Print tool-output token savings and response cache hit rate."""
+    if compact:
+        stats = tool_token_stats()
+        before = sum(s["tokens_before"] for s in stats.values())
+        after = sum(s["tokens_after"] for s in stats.values())
+        if before:
+            print(f"Tool output tokens: {before} -> {after} ({100 * (before - after) / before:.0f}% saved)")
+    if cache_responses:
+        stats = response_cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+
+
+def _preview(content, limit=120):
+    text = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def stream_agent_city(agent, city: str):
+    """Run one city's conversation, printing LLM tokens and tool events as they happen.
+    
+    Returns:
+        The final answer text
+    """
+    final = None
+    mid_line = False  # streamed tokens not yet ended with a newline
+    with run_memo():
+        for mode, chunk in agent.stream(
+            {"messages": [{"role": "user", "content": city_query(city)}]},
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                # token chunks while the model generates (whole messages for cache hits)
+                message, _ = chunk
+                if isinstance(message, AIMessage) and isinstance(message.content, str) and message.content:
+                    print(message.content, end="", flush=True)
+                    mid_line = not message.content.endswith("\n")
+                continue
+            for update in chunk.values():
+                if not isinstance(update, dict):
+                    continue
+                for message in update.get("messages", []):
+                    if mid_line:
+                        print()
+                        mid_line = False
+                    if isinstance(message, ToolMessage):
+                        print(f"[tool] {message.name} -> {_preview(message.content)}", flush=True)
+                    elif isinstance(message, AIMessage):
+                        for call in message.tool_calls:
+                            print(f"[tool] {call['name']}({_preview(call['args'])})", flush=True)
+                        if not message.tool_calls:
+                            final = message.content
+    if mid_line:
+        print()
+    return final
+
+
+def run_agent_planner(cities: list, mode: str = "tools", max_tool_concurrency: int = AGENT_TOOL_CONCURRENCY,
+                      compact: bool = AGENT_COMPACT_TOOLS, cache_responses: bool = AGENT_RESPONSE_CACHE,
+                      stream: bool = False):
+    """Run the agent-based travel planner for multiple cities.
+    
+    Args:
+        cities: List of city names to plan for
+        mode: Agent mode, see create_travel_agent
+        max_tool_concurrency: Max tool calls of one model turn that run at once
+        compact: Send the model compact, token-budgeted tool outputs
+        cache_responses: Reuse final answers for unchanged tool evidence
+        stream: Print LLM tokens and tool calls as they happen instead of
+            the debug step log and the final answer
+    """
+    agent = create_travel_agent(mode=mode, max_tool_concurrency=max_tool_concurrency, compact=compact,
+                                cache_responses=cache_responses, debug=not stream)
+    
+    print("\n" + "=" * 60)
+    print("AGENTIC TRAVEL PLANNER")
+    print("=" * 60 + "\n")
+    
+    for city in cities:
+        print(f"\n{'=' * 60}")
+        print(f"Planning trip to: {city}")
+        print(f"{'=' * 60}\n")
+        
+        if stream:
+            print("-" * 60)
+            print("AGENT RESPONSE (streaming):")
+            print("-" * 60)
+            try:
+                stream_agent_city(agent, city)
+            except Exception as e:
+                print(f"\nError processing {city}: {e}\n")
+                traceback.print_exc()
+            print("\n")
+            continue
         
         try:
-            result = agent.invoke({"messages": [{"role": "user", "content": query}]})
+            # repeated tool calls within this conversation reuse earlier results
+            with run_memo():
+                result = agent.invoke({"messages": [{"role": "user", "content": city_query(city)}]})
             print("\n" + "-" * 60)
             print("AGENT RESPONSE:")
             print("-" * 60)
@@ -270,16 +578,110 @@ Please use ALL the available tools to gather this information."""
             import traceback
             traceback.print_exc()
     
+    print_run_stats(compact, cache_responses)
+    
     print("\n" + "=" * 60)
     print("Planning complete!")
     print("=" * 60 + "\n")
 
 
+async def aplan_city_with_agent(agent, city: str, timeout: float = AGENT_CITY_TIMEOUT) -> dict:
+    """Run one city's agent conversation; never raises.
+    
+    Returns:
+        Dictionary with city, ok, response, error, traceback and elapsed_s
+    """
+    start = time.monotonic()
+    result = {"city": city, "ok": False, "response": None, "error": None, "traceback": None}
+    try:
+        # entered before wait_for creates its task, which copies the context
+        with run_memo():
+            state = await asyncio.wait_for(
+                agent.ainvoke({"messages": [{"role": "user", "content": city_query(city)}]}),
+                timeout,
+            )
+        last_message = state["messages"][-1]
+        result["response"] = getattr(last_message, "content", str(last_message))
+        result["ok"] = True
+    except asyncio.TimeoutError:
+        result["error"] = f"timed out after {timeout:g}s"
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+    result["elapsed_s"] = round(time.monotonic() - start, 2)
+    return result
+
+
+async def arun_agent_batch(cities: list, mode: str = "tools", concurrency: int = AGENT_BATCH_CONCURRENCY,
+                           timeout: float = AGENT_CITY_TIMEOUT,
+                           max_tool_concurrency: int = AGENT_TOOL_CONCURRENCY,
+                           compact: bool = AGENT_COMPACT_TOOLS,
+                           cache_responses: bool = AGENT_RESPONSE_CACHE) -> list:
+    """Plan many cities through one agent, at most `concurrency` conversations at a time.
+    
+    Each city gets its own timeout and its failures are contained, so one bad
+    city does not affect the others.
+    
+    Returns:
+        One result dict per city (see aplan_city_with_agent), in input order
+    """
+    agent = create_travel_agent(mode=mode, max_tool_concurrency=max_tool_concurrency, compact=compact,
+                                debug=False, cache_responses=cache_responses)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def bounded(city):
+        async with semaphore:
+            return await aplan_city_with_agent(agent, city, timeout)
+    
+    return await asyncio.gather(*(bounded(city) for city in cities))
+
+
+def run_agent_batch(cities: list, **kwargs) -> list:
+    """Synchronous wrapper around arun_agent_batch; same arguments and results."""
+    return asyncio.run(arun_agent_batch(cities, **kwargs))
+
+
+def print_batch_results(results: list):
+    """Print batch results in input order, with the traceback for failed cities."""
+    for result in results:
+        print(f"\n{'=' * 60}")
+        print(f"Trip to: {result['city']} ({result['elapsed_s']}s)")
+        print(f"{'=' * 60}\n")
+        if result["ok"]:
+            print(result["response"])
+        else:
+            print(f"Error processing {result['city']}: {result['error']}")
+            if result["traceback"]:
+                print(result["traceback"])
+    failed = sum(1 for r in results if not r["ok"])
+    print(f"\nPlanned {len(results) - failed}/{len(results)} cities ({failed} failed)")
+
+
 if __name__ == "__main__":
-    import sys
+    import argparse
     
-    if len(sys.argv) > 1:
-        cities = sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Agentic travel planner")
+    parser.add_argument("cities", nargs="*", help="City names")
+    parser.add_argument("--mode", choices=sorted(AGENT_MODES), default="tools",
+                        help="'bundle' gathers each city with one composite tool call")
+    parser.add_argument("--tool-concurrency", type=int, default=AGENT_TOOL_CONCURRENCY,
+                        help="Max tool calls of one model turn that run in parallel")
+    parser.add_argument("--full-tool-output", action="store_true",
+                        help="Send the model full tool outputs instead of the compact form")
+    parser.add_argument("--response-cache", action="store_true", default=AGENT_RESPONSE_CACHE,
+                        help="Reuse cached final answers when the tool results are unchanged")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print LLM tokens and tool calls as they happen")
+    parser.add_argument("--batch", action="store_true",
+                        help="Plan the cities concurrently and print the results in input order")
+    parser.add_argument("--concurrency", type=int, default=AGENT_BATCH_CONCURRENCY,
+                        help="Cities planned at once with --batch")
+    parser.add_argument("--timeout", type=float, default=AGENT_CITY_TIMEOUT,
+                        help="Seconds allowed per city with --batch")
+    args = parser.parse_args()
+    
+    if args.cities:
+        cities = args.cities
     else:
         city_input = input("Enter cities separated by commas: ")
         cities = [c.strip() for c in city_input.split(",") if c.strip()]
@@ -288,4 +690,18 @@ if __name__ == "__main__":
         print("No cities provided. Using default: Paris")
         cities = ["Paris"]
     
-    run_agent_planner(cities)
+    compact = AGENT_COMPACT_TOOLS and not args.full_tool_output
+    if args.batch:
+        print_batch_results(run_agent_batch(
+            cities,
+            mode=args.mode,
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            max_tool_concurrency=args.tool_concurrency,
+            compact=compact,
+            cache_responses=args.response_cache,
+        ))
+        print_run_stats(compact, args.response_cache)
+    else:
+        run_agent_planner(cities, mode=args.mode, max_tool_concurrency=args.tool_concurrency, compact=compact,
+                          cache_responses=args.response_cache, stream=args.stream)
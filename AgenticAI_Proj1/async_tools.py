@@ -0,0 +1,234 @@
+"""
+Asyncio versions of the network fetchers in tools.py.
+
+Each coroutine sends the same request as its sync namesake through the shared
+async HTTP client in http_client.py and reuses the tools.py parsers, so the
+results and fallbacks are identical. Pure helpers (three_day_summary,
+extract_aqi, clothing_recommendation, ...) stay in tools.py.
+"""
+
+import asyncio
+
+import http_client
+from cache import location_cached, location_key, normalize_address
+from singleflight import coalesced
+from gazetteer import get_gazetteer, gazetteer_ready, offline_geocode
+from config import GOOGLE_MAPS_API_KEY, OPENWEATHER_API_KEY, LOCATION_CACHE_GRID_KM, HEDGE_DELAY
+from tools import (
+    GEOCODE_URL,
+    WEATHER_URL,
+    AIR_QUALITY_URL,
+    PLACES_URL,
+    OWM_FORECAST_URL,
+    OWM_AIR_QUALITY_URL,
+    geocode_params,
+    parse_geocode,
+    weather_get_params,
+    location_body,
+    has_weather_fields,
+    places_params,
+    rank_attractions,
+    owm_forecast_params,
+    parse_owm_forecast,
+    owm_air_quality_params,
+    parse_owm_air_quality,
+    three_day_summary,
+    google_aqi,
+    has_daily_data,
+    request_shapes,
+    weather_shape_order,
+    weather_hedge_delay,
+    accept_weather_shape,
+    geocode_cache,
+    GeocodeNotFound,
+    weather_cache,
+    air_quality_cache,
+    owm_forecast_cache,
+    owm_air_quality_cache,
+)
+
+
+@coalesced(normalize_address)
+async def geocode_location(address):
+    if not gazetteer_ready():
+        # the first use may compile the whole index; keep that off the loop
+        await asyncio.to_thread(get_gazetteer)
+    known = offline_geocode(address)
+    if known is not None:
+        return known
+
+    # sqlite3 calls block (up to the busy timeout when other processes hold
+    # the lock), so they run in a worker thread instead of on the event loop
+    cached = await asyncio.to_thread(geocode_cache.get, address)
+    if cached is not None:
+        if "error" in cached:
+            raise GeocodeNotFound(cached["error"])
+        return cached
+
+    response = await http_client.async_get(GEOCODE_URL, params=geocode_params(address))
+    try:
+        geo = parse_geocode(response.status_code, response.json() if response.status_code == 200 else {}, address)
+    except GeocodeNotFound as e:
+        await asyncio.to_thread(geocode_cache.put_negative, address, str(e))
+        raise
+    await asyncio.to_thread(geocode_cache.put, address, geo)
+    return geo
+
+
+@location_cached(weather_cache, LOCATION_CACHE_GRID_KM, valid=has_weather_fields)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
+async def get_weather(lat, lng):
+    async def via_get():
+        try:
+            response = await http_client.async_get(WEATHER_URL, params=weather_get_params(lat, lng), timeout=10)
+            return "get", response.json()
+        except Exception:
+            return "get", {}
+
+    async def via_post():
+        try:
+            response = await http_client.async_post(WEATHER_URL, params={"key": GOOGLE_MAPS_API_KEY}, json=location_body(lat, lng), timeout=10)
+            return "post", response.json()
+        except Exception:
+            return "post", {}
+
+    # Try the shape that worked last time first; see tools.get_weather
+    calls = {"get": via_get, "post": via_post}
+    first, second = weather_shape_order()
+    shape, data = await hedged(calls[first], calls[second], accept_weather_shape, weather_hedge_delay())
+    if has_weather_fields(data):
+        request_shapes.record(WEATHER_URL, shape)
+    return data
+
+
+@location_cached(air_quality_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
+async def get_air_quality(lat, lng):
+    """Get current air quality using Google Air Quality API."""
+    try:
+        response = await http_client.async_post(AIR_QUALITY_URL, params={"key": GOOGLE_MAPS_API_KEY}, json=location_body(lat, lng), timeout=10)
+        response.raise_for_status()  # Raise error for bad status codes
+        data = response.json()
+    except Exception as e:
+        print(f"Air quality API error: {e}")
+        data = {}
+    return data
+
+
+@coalesced()
+async def get_attractions(city, lat, lng, radius_km=2, max_results=5):
+    """Async Google Places Text Search; see tools.get_attractions."""
+    response = await http_client.async_get(PLACES_URL, params=places_params(city))
+    return rank_attractions(response.json(), lat, lng, radius_km, max_results)
+
+
+@location_cached(owm_forecast_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
+async def get_owm_forecast(lat, lng, days=3):
+    """Return a list of day dicts using OpenWeatherMap One Call API (metric units)."""
+    if not OPENWEATHER_API_KEY:
+        return None
+    try:
+        r = await http_client.async_get(OWM_FORECAST_URL, params=owm_forecast_params(lat, lng), timeout=10)
+        data = r.json()
+    except Exception:
+        return None
+    return parse_owm_forecast(data, days)
+
+
+@location_cached(owm_air_quality_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
+async def get_owm_air_quality(lat, lng):
+    """Return a dict with OWM AQI index and a category/estimate."""
+    if not OPENWEATHER_API_KEY:
+        return None
+    try:
+        r = await http_client.async_get(OWM_AIR_QUALITY_URL, params=owm_air_quality_params(lat, lng), timeout=10)
+        data = r.json()
+    except Exception:
+        return None
+    return parse_owm_air_quality(data)
+
+
+async def hedged(primary, backup, accept, delay=None):
+    """Async counterpart of tools.hedged; primary and backup are coroutine functions.
+
+    Unlike the threaded version, the losing request is actually cancelled.
+    """
+    if delay is None:
+        result = await primary()
+        return result if accept(result) else await backup()
+
+    primary_task = asyncio.ensure_future(primary())
+    backup_task = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done and primary_task.exception() is None and accept(primary_task.result()):
+            return primary_task.result()
+
+        backup_task = asyncio.ensure_future(backup())
+        pending = {backup_task} if done else {primary_task, backup_task}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and accept(task.result()):
+                    return task.result()
+        if backup_task.exception() is None or primary_task.exception() is not None:
+            return backup_task.result()
+        return primary_task.result()
+    finally:
+        for task in (primary_task, backup_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def get_daily_forecast(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return (daily, weather_json); see tools.get_daily_forecast."""
+    async def owm():
+        return await get_owm_forecast(lat, lng), None
+
+    async def google():
+        weather = await get_weather(lat, lng)
+        return three_day_summary(weather), weather
+
+    if not OPENWEATHER_API_KEY:
+        return await google()
+    return await hedged(owm, google, lambda r: has_daily_data(r[0]), hedge_delay)
+
+
+async def fetch_aqi(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return (aqi, source); see tools.fetch_aqi."""
+    async def owm():
+        owm_aq = await get_owm_air_quality(lat, lng)
+        if not owm_aq:
+            return None, "OpenWeatherMap"
+        return owm_aq.get("aqi_estimate") or owm_aq.get("owm_index"), "OpenWeatherMap"
+
+    async def google():
+        return google_aqi(await get_air_quality(lat, lng)), "Google Air Quality"
+
+    if not OPENWEATHER_API_KEY:
+        return await google()
+    return await hedged(owm, google, lambda r: r[0] is not None, hedge_delay)
+
+
+async def get_aqi(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return a numeric AQI for a location (OpenWeatherMap first, then Google)."""
+    return (await fetch_aqi(lat, lng, hedge_delay))[0]
+
+
+async def fetch_place_data(city, lat, lng, radius_km=2):
+    """Gather attractions, forecast and AQI for a geocoded place concurrently."""
+    attractions, (daily, weather), aqi = await asyncio.gather(
+        get_attractions(city, lat, lng, radius_km=radius_km),
+        get_daily_forecast(lat, lng),
+        get_aqi(lat, lng),
+    )
+    return {"attractions": attractions, "daily": daily, "aqi": aqi, "weather": weather}
+
+
+async def fetch_city_bundle(city, radius_km=2):
+    """Geocode a city, then gather attractions, forecast and AQI concurrently."""
+    geo = await geocode_location(city)
+    lat, lng = geo["lat"], geo["lng"]
+    return {"lat": lat, "lng": lng, "address": geo.get("address", ""), **await fetch_place_data(city, lat, lng, radius_km)}
@@ -0,0 +1,387 @@
+"""
+Local caches for provider lookups.
+
+GeocodeCache keeps geocoding answers in a SQLite file under PLANNER_CACHE_DIR
+so they survive restarts. The database runs in WAL mode with a busy timeout,
+which lets several planner processes (CLI runs, Streamlit sessions) read and
+write it at the same time.
+
+RequestShapeMemory remembers, per endpoint, which request form (e.g. GET with
+query parameters vs. POST with a JSON body) returned usable data, so later
+calls go straight to it. It is stored next to the geocode cache.
+
+ResponseCache stores the agent's final answers, keyed on a hash of the model,
+prompt and tool evidence (see agent.ResponseCacheMiddleware), in the same
+directory.
+
+TTLCache is a bounded in-process LRU used for weather and air quality. The
+location_cached decorator keys it on coordinates snapped to a grid, so two
+lookups a few metres apart share one result.
+"""
+
+import functools
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_address(address):
+    """Case-fold and collapse whitespace so "  new YORK " and "New York" share a key."""
+    return " ".join(str(address).casefold().split())
+
+
+class SQLiteStore:
+    """Per-thread SQLite connections to one database file (connections are not thread-safe)."""
+
+    def __init__(self, path, schema, synchronous="NORMAL"):
+        self.path = path
+        self.schema = schema
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+
+class GeocodeCache:
+    """Persistent geocode cache keyed on the normalized address string.
+
+    Successful lookups live for `ttl` seconds; "no results" answers are kept
+    separately for the much shorter `negative_ttl`. Request failures (bad key,
+    quota, network) are never cached.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS geocode (
+        key TEXT PRIMARY KEY,
+        lat REAL,
+        lng REAL,
+        address TEXT,
+        stored_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS geocode_negative (
+        key TEXT PRIMARY KEY,
+        error TEXT,
+        stored_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path, ttl, negative_ttl):
+        self.store = SQLiteStore(path, self.SCHEMA)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, address):
+        """Return a geo dict, {"error": msg} for a cached miss, or None if unknown/expired."""
+        if self.ttl <= 0:
+            return None
+        key = normalize_address(address)
+        now = time.time()
+        try:
+            conn = self.store.connect()
+            row = conn.execute(
+                "SELECT lat, lng, address FROM geocode WHERE key = ? AND stored_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                return {"lat": row[0], "lng": row[1], "address": row[2]}
+            row = conn.execute(
+                "SELECT error FROM geocode_negative WHERE key = ? AND stored_at > ?",
+                (key, now - self.negative_ttl),
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is not None:
+            self.negative_hits += 1
+            return {"error": row[0]}
+        self.misses += 1
+        return None
+
+    def put(self, address, geo):
+        if self.ttl <= 0:
+            return
+        try:
+            self.store.connect().execute(
+                "INSERT OR REPLACE INTO geocode (key, lat, lng, address, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (normalize_address(address), geo["lat"], geo["lng"], geo.get("address"), time.time()),
+            )
+        except sqlite3.Error:
+            pass
+
+    def put_negative(self, address, error):
+        if self.ttl <= 0 or self.negative_ttl <= 0:
+            return
+        try:
+            self.store.connect().execute(
+                "INSERT OR REPLACE INTO geocode_negative (key, error, stored_at) VALUES (?, ?, ?)",
+                (normalize_address(address), error, time.time()),
+            )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        return {"hits": self.hits, "negative_hits": self.negative_hits, "misses": self.misses}
+
+
+class RequestShapeMemory:
+    """Per-endpoint memory of the request shape that last produced usable data.
+
+    Lookups are served from process memory after the first read. An entry
+    older than `recheck_after` seconds is ignored once so the default order
+    is tried again, which picks up changes on the API side.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS request_shape (
+        endpoint TEXT PRIMARY KEY,
+        shape TEXT NOT NULL,
+        learned_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path, recheck_after):
+        self.store = SQLiteStore(path, self.SCHEMA)
+        self.recheck_after = recheck_after
+        self._known = {}
+        self._lock = threading.Lock()
+
+    def _load(self, endpoint):
+        try:
+            row = self.store.connect().execute(
+                "SELECT shape, learned_at FROM request_shape WHERE endpoint = ?", (endpoint,)
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        return (row[0], row[1]) if row else (None, 0.0)
+
+    def preferred(self, endpoint):
+        """Return the remembered shape, or None when unknown or due for a re-check."""
+        with self._lock:
+            entry = self._known.get(endpoint)
+        if entry is None:
+            entry = self._load(endpoint)
+            with self._lock:
+                self._known[endpoint] = entry
+        shape, learned_at = entry
+        if shape is None or time.time() - learned_at > self.recheck_after:
+            return None
+        return shape
+
+    def record(self, endpoint, shape):
+        """Remember that `shape` worked; only writes when something changed or aged out."""
+        now = time.time()
+        with self._lock:
+            known_shape, learned_at = self._known.get(endpoint, (None, 0.0))
+            if known_shape == shape and now - learned_at <= self.recheck_after:
+                return
+            self._known[endpoint] = (shape, now)
+        try:
+            self.store.connect().execute(
+                "INSERT OR REPLACE INTO request_shape (endpoint, shape, learned_at) VALUES (?, ?, ?)",
+                (endpoint, shape, now),
+            )
+        except sqlite3.Error:
+            pass
+
+
+class ResponseCache:
+    """Persistent cache of final LLM answers with TTL expiry and hit-rate counters."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_response (
+        key TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        stored_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path, ttl):
+        self.store = SQLiteStore(path, self.SCHEMA)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached answer text, or None if unknown or expired.
+
+        Only hits are counted here; the caller reports a miss (record_miss)
+        once a lookup turns out to have needed a fresh final answer, so
+        intermediate tool-calling turns do not dilute the hit rate.
+        """
+        try:
+            row = self.store.connect().execute(
+                "SELECT content FROM llm_response WHERE key = ? AND stored_at > ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            return None
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, content):
+        if self.ttl <= 0:
+            return
+        try:
+            self.store.connect().execute(
+                "INSERT OR REPLACE INTO llm_response (key, content, stored_at) VALUES (?, ?, ?)",
+                (key, content, time.time()),
+            )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def quantize(lat, lng, grid_km):
+    """Snap lat/lng to a grid of roughly grid_km cells (no-op when grid_km is falsy)."""
+    if not grid_km:
+        return lat, lng
+    step = grid_km / 111.32  # km per degree of latitude
+    return round(round(lat / step) * step, 6), round(round(lng / step) * step, 6)
+
+
+_ttl_caches = []
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, name, maxsize, ttl):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _ttl_caches.append(self)
+
+    def get(self, key):
+        """Return (found, value)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def cache_stats():
+    """Return hit/miss/eviction counters for every TTLCache in the process."""
+    return {c.name: c.stats() for c in _ttl_caches}
+
+
+def location_key(grid_km):
+    """Build a key function for (lat, lng, *args, **kwargs) calls on a grid_km grid."""
+
+    def make_key(lat, lng, *args, **kwargs):
+        return quantize(lat, lng, grid_km) + (args, tuple(sorted(kwargs.items())))
+
+    return make_key
+
+
+def location_cached(cache, grid_km, valid=bool):
+    """Cache a fetcher whose first two arguments are lat and lng.
+
+    Works for both plain functions and coroutines. Only results accepted by
+    `valid` are stored; by default that skips the empty values (None, {}) the
+    tools layer returns on failure.
+    """
+
+    make_key = location_key(grid_km)
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(lat, lng, *args, **kwargs):
+                key = make_key(lat, lng, *args, **kwargs)
+                found, value = cache.get(key)
+                if found:
+                    return value
+                value = await fn(lat, lng, *args, **kwargs)
+                if valid(value):
+                    cache.set(key, value)
+                return value
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(lat, lng, *args, **kwargs):
+            key = make_key(lat, lng, *args, **kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = fn(lat, lng, *args, **kwargs)
+            if valid(value):
+                cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
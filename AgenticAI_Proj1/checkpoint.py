@@ -0,0 +1,86 @@
+"""
+Checkpoint/resume for long planner batches (main.py --checkpoint PATH).
+
+Every successfully planned city is stored in a SQLite file as soon as it is
+fetched, keyed on the parsed (city, start, end) token. A restarted run loads
+those records instead of fetching them again, and only the missing or
+previously failed tokens go to the providers. Because resumed records flow
+through the normal report, the printed output, mask total and exports cover
+the whole batch. The file uses synchronous=FULL, so a record that was written
+survives a crash or power loss.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+from cache import SQLiteStore
+
+
+def checkpoint_key(city, start, end):
+    return json.dumps([city, start.isoformat() if start else None, end.isoformat() if end else None])
+
+
+class Checkpoint:
+    """Finished city results of a batch, keyed on the parsed token."""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS city_result (
+        key TEXT PRIMARY KEY,
+        result TEXT NOT NULL,
+        finished_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path):
+        self.store = SQLiteStore(path, self.SCHEMA, synchronous="FULL")
+        self.resumed = 0
+        self.recorded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def get(self, city, start, end):
+        """Return the stored result record for the token, or None.
+
+        An unreadable checkpoint (locked, corrupt) counts as a miss, so the
+        city is fetched again rather than failing the batch.
+        """
+        try:
+            row = self.store.connect().execute(
+                "SELECT result FROM city_result WHERE key = ?", (checkpoint_key(city, start, end),)
+            ).fetchone()
+            result = json.loads(row[0]) if row is not None else None
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Checkpoint read failed for '{city}': {e}")
+            return None
+        if result is None:
+            return None
+        with self._lock:
+            self.resumed += 1
+        return result
+
+    def put(self, city, start, end, result):
+        """Record a finished city; a failed write is logged and counted, never raised."""
+        try:
+            self.store.connect().execute(
+                "INSERT OR REPLACE INTO city_result (key, result, finished_at) VALUES (?, ?, ?)",
+                (checkpoint_key(city, start, end), json.dumps(result, ensure_ascii=False), time.time()),
+            )
+        except sqlite3.Error as e:
+            print(f"Checkpoint write failed for '{city}': {e}")
+            with self._lock:
+                self.failed += 1
+            return
+        with self._lock:
+            self.recorded += 1
+
+    def __len__(self):
+        try:
+            return self.store.connect().execute("SELECT COUNT(*) FROM city_result").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {"resumed": self.resumed, "recorded": self.recorded, "failed": self.failed}
@@ -0,0 +1,195 @@
+"""
+Compact, token-budgeted tool outputs for the LangChain agent.
+
+Every tool result is sent back to the model on each later turn, so in compact
+mode the agent only sees the fields its prompts use: floats are rounded, the
+raw Google Weather payload and attraction addresses/coordinates are dropped,
+and each reply is trimmed to its tool's budget in TOOL_TOKEN_BUDGETS. Token
+counts before and after are kept per tool (tool_token_stats()).
+"""
+
+import json
+import threading
+
+try:
+    import tiktoken
+except ImportError:  # optional; token counts fall back to an estimate
+    tiktoken = None
+
+from config import TOOL_TOKEN_BUDGETS
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Load the o200k_base encoding once; None when tiktoken or its data file is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    # tiktoken downloads the encoding file on first use
+                    _encoding = tiktoken.get_encoding("o200k_base") if tiktoken else None
+                except Exception:
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    """Count o200k_base tokens, or estimate ~4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def tool_message_text(value):
+    """Serialize a tool result the way LangGraph's ToolNode does."""
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def to_compact_json(value):
+    """Minified JSON; strings (e.g. clothing advice) are passed through unquoted."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _round(value, digits):
+    return round(value, digits) if isinstance(value, float) else value
+
+
+def _with_error(source, out):
+    if isinstance(source, dict) and "error" in source:
+        out["error"] = source["error"]
+    return out
+
+
+def compact_coordinates(geo):
+    return _with_error(geo, {
+        "lat": _round(geo.get("lat"), 4),
+        "lng": _round(geo.get("lng"), 4),
+        "address": geo.get("address"),
+    })
+
+
+def compact_daily(daily):
+    return [
+        {"high": _round(d.get("high"), 1), "low": _round(d.get("low"), 1), "precip": _round(d.get("precip"), 0)}
+        for d in daily or []
+    ]
+
+
+def compact_weather(weather):
+    return _with_error(weather, {"daily": compact_daily(weather.get("daily"))})
+
+
+def compact_air_quality(aq):
+    return _with_error(aq, {"aqi": _round(aq.get("aqi"), 0), "category": aq.get("category")})
+
+
+def compact_attractions(places):
+    return [
+        _with_error(p, {"name": p.get("name"), "distance_km": _round(p.get("distance_km"), 1), "type": p.get("type")})
+        if "name" in p else p
+        for p in places or []
+    ]
+
+
+def compact_bundle(bundle):
+    if "daily" not in bundle:
+        return bundle  # error reply
+    return {
+        "address": bundle.get("address"),
+        "daily": compact_daily(bundle.get("daily")),
+        "aqi": _round(bundle.get("aqi"), 0),
+        "aqi_category": bundle.get("aqi_category"),
+        "avg_high_c": _round(bundle.get("avg_high_c"), 1),
+        "clothing": bundle.get("clothing"),
+        "umbrella": bundle.get("umbrella"),
+        "mask": bundle.get("mask"),
+        "attractions": compact_attractions(bundle.get("attractions")),
+    }
+
+
+# tool name -> compactor; tools not listed (advice strings, booleans) pass through
+COMPACTORS = {
+    "get_location_coordinates": compact_coordinates,
+    "get_weather_forecast": compact_weather,
+    "get_air_quality_data": compact_air_quality,
+    "get_tourist_attractions": compact_attractions,
+    "get_city_travel_bundle": compact_bundle,
+}
+
+
+def _shrink(value):
+    """Drop the least useful trailing item (attractions are sorted by distance), or None."""
+    if isinstance(value, list) and len(value) > 1:
+        return value[:-1]
+    if isinstance(value, dict) and value.get("attractions"):
+        return {**value, "attractions": value["attractions"][:-1]}
+    return None
+
+
+def fit_budget(value, budget):
+    """Return (text, tokens, trimmed) with list items dropped until the JSON fits `budget`.
+
+    Values that cannot shrink further are returned whole rather than cut mid-JSON.
+    """
+    text = to_compact_json(value)
+    tokens = count_tokens(text)
+    trimmed = 0
+    while budget and tokens > budget:
+        smaller = _shrink(value)
+        if smaller is None:
+            break
+        value = smaller
+        text = to_compact_json(value)
+        tokens = count_tokens(text)
+        trimmed += 1
+    return text, tokens, trimmed
+
+
+def canonical_evidence(tool_name, content):
+    """Canonical form of a tool message for cache keys: compact fields only, keys sorted.
+
+    Compactors are idempotent, so full and compact outputs of the same data
+    give the same string, and volatile fields (raw payload timestamps) drop out.
+    """
+    try:
+        value = json.loads(content)
+    except (TypeError, ValueError):
+        return f"{tool_name}:{content}"
+    compactor = COMPACTORS.get(tool_name)
+    if compactor is not None and isinstance(value, (dict, list)):
+        value = compactor(value)
+    return f"{tool_name}:" + json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def compact_output(tool_name, value):
+    """Compact one tool result to a JSON string within the tool's token budget."""
+    before = count_tokens(tool_message_text(value))
+    compactor = COMPACTORS.get(tool_name)
+    if compactor is not None and isinstance(value, (dict, list)):
+        value = compactor(value)
+    text, after, trimmed = fit_budget(value, TOOL_TOKEN_BUDGETS.get(tool_name))
+    with _stats_lock:
+        s = _stats.setdefault(tool_name, {"calls": 0, "tokens_before": 0, "tokens_after": 0, "trimmed": 0})
+        s["calls"] += 1
+        s["tokens_before"] += before
+        s["tokens_after"] += after
+        s["trimmed"] += trimmed
+    return text
+
+
+def tool_token_stats():
+    """Return per-tool call counts and token totals before/after compaction."""
+    with _stats_lock:
+        return {name: dict(s) for name, s in _stats.items()}
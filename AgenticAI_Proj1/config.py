@@ -7,6 +7,77 @@ GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")  # optional; add to .env if available
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Pooled HTTP sessions used by tools.py (see http_client.py)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))  # max open connections per provider host
+HTTP_IDLE_TIMEOUT = float(os.getenv("HTTP_IDLE_TIMEOUT", "60"))  # seconds before an idle session is evicted
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+# Requests/second per provider (see ratelimit.py); override with e.g.
+# RATE_LIMIT_OPENWEATHERMAP=1. A rate of 0 disables limiting for that provider.
+_DEFAULT_RATE_LIMITS = {
+    "google_geocoding": 40,
+    "google_places": 10,
+    "google_weather": 10,
+    "google_air_quality": 10,
+    "openweathermap": 1,
+    "openai": 5,
+}
+RATE_LIMITS = {name: float(os.getenv(f"RATE_LIMIT_{name.upper()}", rate)) for name, rate in _DEFAULT_RATE_LIMITS.items()}
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))  # retries after a 429
+
+# Seconds to wait for the preferred weather/AQI provider before also starting
+# the fallback one (0 = race both immediately). Unset keeps the sequential fallback.
+HEDGE_DELAY = float(os.environ["HEDGE_DELAY"]) if os.getenv("HEDGE_DELAY") else None
+
+# Max tool calls from one agent turn that run at the same time
+AGENT_TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "4"))
+
+# Batch agent runs (agent.py --batch): cities planned at once, and the
+# seconds one city's conversation may take before it is abandoned
+AGENT_BATCH_CONCURRENCY = int(os.getenv("AGENT_BATCH_CONCURRENCY", "8"))
+AGENT_CITY_TIMEOUT = float(os.getenv("AGENT_CITY_TIMEOUT", "120"))
+
+# Compact agent tool outputs (see compact.py): keep only the fields the prompts
+# use and cap each reply at a token budget; override a budget with e.g.
+# TOOL_TOKEN_BUDGET_GET_TOURIST_ATTRACTIONS=150. AGENT_COMPACT_TOOLS=0 sends full outputs.
+AGENT_COMPACT_TOOLS = os.getenv("AGENT_COMPACT_TOOLS", "1") != "0"
+_DEFAULT_TOOL_TOKEN_BUDGETS = {
+    "get_location_coordinates": 60,
+    "get_weather_forecast": 80,
+    "get_air_quality_data": 30,
+    "get_tourist_attractions": 160,
+    "get_city_travel_bundle": 300,
+}
+TOOL_TOKEN_BUDGETS = {name: int(os.getenv(f"TOOL_TOKEN_BUDGET_{name.upper()}", budget)) for name, budget in _DEFAULT_TOOL_TOKEN_BUDGETS.items()}
+
+# Rows per Parquet row group for main.py --export parquet (see parquet_export.py)
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "65536"))
+
+# Local caches (see cache.py)
+CACHE_DIR = os.getenv("PLANNER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".planner_cache"))
+GEOCODE_CACHE_PATH = os.path.join(CACHE_DIR, "geocode.sqlite3")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(180 * 24 * 3600)))  # 0 disables the cache
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))
+REQUEST_SHAPE_PATH = os.path.join(CACHE_DIR, "request_shapes.sqlite3")
+REQUEST_SHAPE_RECHECK = float(os.getenv("REQUEST_SHAPE_RECHECK", str(6 * 3600)))  # re-probe learned request shapes
+LOCATION_CACHE_GRID_KM = float(os.getenv("LOCATION_CACHE_GRID_KM", "1.0"))  # coordinate snapping for weather/AQI keys
+QUERY_PLAN_CACHE_SIZE = int(os.getenv("QUERY_PLAN_CACHE_SIZE", "4096"))  # city names / places kept per run (LRU)
+LOCATION_CACHE_SIZE = int(os.getenv("LOCATION_CACHE_SIZE", "2048"))  # entries per cache
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", str(3 * 3600)))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", str(30 * 60)))
+AIR_QUALITY_CACHE_TTL = float(os.getenv("AIR_QUALITY_CACHE_TTL", str(15 * 60)))
+# Offline gazetteer (see gazetteer.py): a GeoNames-style cities dump compiled
+# into a memory-mapped index; GAZETTEER=0 always geocodes through Google
+GAZETTEER_ENABLED = os.getenv("GAZETTEER", "1") != "0"
+GAZETTEER_SOURCE = os.getenv("GAZETTEER_SOURCE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.tsv"))
+GAZETTEER_PATH = os.path.join(CACHE_DIR, "gazetteer.bin")
+# Final agent answers, reused while the tool evidence is unchanged (agent.py --response-cache)
+AGENT_RESPONSE_CACHE = os.getenv("AGENT_RESPONSE_CACHE", "0") == "1"
+AGENT_RESPONSE_CACHE_PATH = os.path.join(CACHE_DIR, "llm_responses.sqlite3")
+AGENT_RESPONSE_CACHE_TTL = float(os.getenv("AGENT_RESPONSE_CACHE_TTL", str(3 * 3600)))
+
 if not GOOGLE_MAPS_API_KEY:
     raise ValueError("Google Maps API key not found")
 
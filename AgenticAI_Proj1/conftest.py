@@ -0,0 +1,8 @@
+"""Offline test setup: config.py requires API keys at import, and caches go to a temp dir."""
+
+import os
+import tempfile
+
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("PLANNER_CACHE_DIR", tempfile.mkdtemp(prefix="planner_test_cache_"))
@@ -0,0 +1,309 @@
+"""
+Offline gazetteer: coordinates for well-known cities without a network call.
+
+The source is a GeoNames-style cities dump (tab-separated, the column layout
+of cities15000.txt; data/cities.tsv is bundled and GAZETTEER_SOURCE can point
+at a full download). On first use it is compiled into a compact binary index
+in CACHE_DIR and memory-mapped, and it is recompiled whenever the source file
+changes. Layout (little-endian):
+
+- header:  magic, city count, key count, source size and mtime
+- cities:  fixed-size records (lat, lng, population, country code, and
+           offsets of name / admin1 / display address in the string pool)
+- keys:    (key offset, key length, city index), sorted by the UTF-8 bytes of
+           the key and then by population, so lookups are binary searches
+- pool:    UTF-8 strings
+
+Every name, ASCII name and alternate name of a city is a key, normalized
+like the geocode cache (normalize_address). Lookups:
+
+- lookup("paris")          exact name, most populous first
+- resolve("Paris, TX")     best exact match; a trailing ", <qualifier>" must
+                           match the country code, country name or admin1 code
+- prefix("san ")           names starting with the text
+- fuzzy("Barcelnoa")       close spellings (difflib), for suggestions
+
+tools.geocode_location answers from resolve() before going to Google, and
+main.py mock mode uses it for coordinates.
+"""
+
+import difflib
+import heapq
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from cache import normalize_address
+from config import GAZETTEER_ENABLED, GAZETTEER_SOURCE, GAZETTEER_PATH
+
+MAGIC = b"GAZ1"
+HEADER = struct.Struct("<4sIIqq")
+CITY = struct.Struct("<ddI2sIHIHIH")
+KEY = struct.Struct("<IHI")
+
+# GeoNames cities dump columns used here
+NAME, ASCII_NAME, ALTERNATE_NAMES, LAT, LNG = 1, 2, 3, 4, 5
+COUNTRY_CODE, ADMIN1, POPULATION = 8, 10, 14
+
+# Country names for display addresses and ", <country>" qualifiers; codes not
+# listed are shown as the code itself
+COUNTRY_NAMES = {
+    "AE": "United Arab Emirates", "AO": "Angola", "AR": "Argentina", "AT": "Austria", "AU": "Australia",
+    "BD": "Bangladesh", "BE": "Belgium", "BR": "Brazil", "CA": "Canada", "CH": "Switzerland", "CL": "Chile",
+    "CN": "China", "CO": "Colombia", "CR": "Costa Rica", "CU": "Cuba", "CZ": "Czechia", "DE": "Germany",
+    "DK": "Denmark", "EC": "Ecuador", "EG": "Egypt", "ES": "Spain", "ET": "Ethiopia", "FI": "Finland",
+    "FR": "France", "GB": "UK", "GH": "Ghana", "GR": "Greece", "HK": "Hong Kong", "HU": "Hungary",
+    "ID": "Indonesia", "IE": "Ireland", "IL": "Israel", "IN": "India", "IQ": "Iraq", "IR": "Iran",
+    "IS": "Iceland", "IT": "Italy", "JO": "Jordan", "JP": "Japan", "KE": "Kenya", "KR": "South Korea",
+    "LB": "Lebanon", "LK": "Sri Lanka", "MA": "Morocco", "MX": "Mexico", "MY": "Malaysia", "NG": "Nigeria",
+    "NL": "Netherlands", "NO": "Norway", "NP": "Nepal", "NZ": "New Zealand", "PE": "Peru",
+    "PH": "Philippines", "PK": "Pakistan", "PL": "Poland", "PT": "Portugal", "QA": "Qatar", "RO": "Romania",
+    "RU": "Russia", "SA": "Saudi Arabia", "SD": "Sudan", "SE": "Sweden", "SG": "Singapore", "TH": "Thailand",
+    "TR": "Türkiye", "TW": "Taiwan", "TZ": "Tanzania", "UA": "Ukraine", "US": "USA", "UY": "Uruguay",
+    "VN": "Vietnam", "ZA": "South Africa",
+}
+# Alternative spellings accepted as qualifiers
+COUNTRY_ALIASES = {
+    "united states": "US", "united states of america": "US", "usa": "US",
+    "united kingdom": "GB", "uk": "GB", "england": "GB", "scotland": "GB",
+    "czech republic": "CZ", "korea": "KR", "turkey": "TR", "uae": "AE",
+}
+
+City = namedtuple("City", "name lat lng population country_code admin1 address")
+
+
+def display_address(name, country_code, admin1):
+    """Google-style address: "Paris, France", or "Portland, OR, USA" where admin1 is a letter code."""
+    parts = [name]
+    if admin1.isalpha() and len(admin1) == 2 and country_code in ("US", "CA"):
+        parts.append(admin1)
+    parts.append(COUNTRY_NAMES.get(country_code, country_code))
+    return ", ".join(parts)
+
+
+def _read_source(path):
+    """Yield (names, lat, lng, population, country_code, admin1) from a GeoNames-style dump."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) <= POPULATION or not fields[NAME]:
+                continue
+            names = [fields[NAME], fields[ASCII_NAME]] + fields[ALTERNATE_NAMES].split(",")
+            yield (
+                names,
+                float(fields[LAT]),
+                float(fields[LNG]),
+                int(fields[POPULATION] or 0),
+                fields[COUNTRY_CODE][:2].upper(),
+                fields[ADMIN1],
+            )
+
+
+def build_index(source, path):
+    """Compile the source dump into the binary index at `path` (written atomically)."""
+    pool = bytearray()
+    offsets = {}
+
+    def intern(text):
+        data = text.encode("utf-8")
+        if data not in offsets:
+            offsets[data] = len(pool)
+            pool.extend(data)
+        return offsets[data], len(data)
+
+    cities = []
+    keys = []
+    for names, lat, lng, population, country_code, admin1 in _read_source(source):
+        index = len(cities)
+        name = names[0]
+        cities.append(CITY.pack(
+            lat, lng, min(population, 0xFFFFFFFF), country_code.encode("ascii", "replace").ljust(2),
+            *intern(name), *intern(admin1), *intern(display_address(name, country_code, admin1)),
+        ))
+        for key in {normalize_address(n) for n in names if n.strip()}:
+            keys.append((key.encode("utf-8"), -population, index))
+
+    keys.sort()
+    key_table = bytearray()
+    for key, _, index in keys:
+        offset, length = intern(key.decode("utf-8"))
+        key_table += KEY.pack(offset, length, index)
+
+    stat = os.stat(source)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(cities), len(keys), stat.st_size, stat.st_mtime_ns))
+        f.write(b"".join(cities))
+        f.write(key_table)
+        f.write(pool)
+    os.replace(tmp, path)
+
+
+def _is_current(path, source):
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        stat = os.stat(source)
+    except OSError:
+        return False
+    if len(header) < HEADER.size:
+        return False
+    magic, _, _, size, mtime_ns = HEADER.unpack(header)
+    return magic == MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns
+
+
+class Gazetteer:
+    """Read-only view of a compiled index; safe to share between threads."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, self.city_count, self.key_count, _, _ = HEADER.unpack_from(self._mm, 0)
+        self._cities_at = HEADER.size
+        self._keys_at = self._cities_at + self.city_count * CITY.size
+        self._pool_at = self._keys_at + self.key_count * KEY.size
+
+    def __len__(self):
+        return self.city_count
+
+    def _text(self, offset, length):
+        start = self._pool_at + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _key(self, i):
+        offset, length, index = KEY.unpack_from(self._mm, self._keys_at + i * KEY.size)
+        start = self._pool_at + offset
+        return self._mm[start:start + length], index
+
+    def city(self, index):
+        lat, lng, population, cc, *strings = CITY.unpack_from(self._mm, self._cities_at + index * CITY.size)
+        name, admin1, address = (self._text(strings[i], strings[i + 1]) for i in (0, 2, 4))
+        return City(name, lat, lng, population, cc.decode("ascii").strip(), admin1, address)
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self.key_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _scan(self, key, exact):
+        """Yield (key, city index) from the first key >= `key` while it matches."""
+        i = self._lower_bound(key)
+        seen = set()
+        while i < self.key_count:
+            found, index = self._key(i)
+            if found != key if exact else not found.startswith(key):
+                break
+            if index not in seen:
+                seen.add(index)
+                yield found, index
+            i += 1
+
+    def lookup(self, name):
+        """Cities named exactly `name` (any of their names), most populous first."""
+        key = normalize_address(name).encode("utf-8")
+        return [self.city(index) for _, index in self._scan(key, exact=True)] if key else []
+
+    def resolve(self, query):
+        """Best exact match for "City" or "City, qualifier[, ...]", or None."""
+        cities = self.lookup(query)
+        if cities:
+            return cities[0]
+        name, _, rest = query.partition(",")
+        qualifiers = [normalize_address(q) for q in rest.split(",") if q.strip()]
+        if not qualifiers:
+            return None
+        for city in self.lookup(name):
+            accepted = {
+                city.country_code.casefold(),
+                normalize_address(COUNTRY_NAMES.get(city.country_code, "")),
+                city.admin1.casefold(),
+            }
+            accepted |= {alias for alias, code in COUNTRY_ALIASES.items() if code == city.country_code}
+            if all(q in accepted for q in qualifiers):
+                return city
+        return None
+
+    def prefix(self, text, limit=10):
+        """Cities with a name starting with `text`, most populous first."""
+        key = normalize_address(text).encode("utf-8")
+        if not key:
+            return []
+        cities = (self.city(index) for _, index in self._scan(key, exact=False))
+        return heapq.nlargest(limit, cities, key=lambda c: c.population)
+
+    def fuzzy(self, text, limit=5, cutoff=0.75):
+        """Cities whose names are close to `text` (best match, then population, first).
+
+        Only names sharing the first letter are compared, which keeps this fast
+        on a full GeoNames dump.
+        """
+        query = normalize_address(text)
+        if not query:
+            return []
+        candidates = {}
+        for key, index in self._scan(query[0].encode("utf-8"), exact=False):
+            candidates.setdefault(key.decode("utf-8"), []).append(index)
+        matches = difflib.get_close_matches(query, list(candidates), n=limit * 2, cutoff=cutoff)
+        ratio = {m: difflib.SequenceMatcher(None, query, m).ratio() for m in matches}
+        ranked = {}
+        for match in matches:
+            for index in candidates[match]:
+                if index not in ranked:
+                    city = self.city(index)
+                    ranked[index] = (-ratio[match], -city.population, city)
+        return [city for *_, city in sorted(ranked.values(), key=lambda r: r[:2])][:limit]
+
+    def geocode(self, query):
+        """{"lat", "lng", "address"} like tools.parse_geocode, or None when unknown."""
+        city = self.resolve(query)
+        if city is None:
+            return None
+        return {"lat": city.lat, "lng": city.lng, "address": city.address}
+
+
+_gazetteer = None
+_gazetteer_loaded = False
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Open (compiling if needed) the configured gazetteer once; None when disabled or missing."""
+    global _gazetteer, _gazetteer_loaded
+    if not _gazetteer_loaded:
+        with _gazetteer_lock:
+            if not _gazetteer_loaded:
+                try:
+                    if GAZETTEER_ENABLED and os.path.exists(GAZETTEER_SOURCE):
+                        if not _is_current(GAZETTEER_PATH, GAZETTEER_SOURCE):
+                            build_index(GAZETTEER_SOURCE, GAZETTEER_PATH)
+                        _gazetteer = Gazetteer(GAZETTEER_PATH)
+                except (OSError, ValueError, struct.error) as e:
+                    print(f"Gazetteer unavailable: {e}")
+                    _gazetteer = None
+                _gazetteer_loaded = True
+    return _gazetteer
+
+
+def gazetteer_ready():
+    """True once get_gazetteer() has run (so later calls never compile the index)."""
+    return _gazetteer_loaded
+
+
+def offline_geocode(address):
+    """Geocode from the gazetteer; None when it is unavailable or does not know the place."""
+    gazetteer = get_gazetteer()
+    return gazetteer.geocode(address) if gazetteer is not None else None
+
+
+def suggest(text, limit=3):
+    """Names of known cities close to `text`, for "did you mean" hints."""
+    gazetteer = get_gazetteer()
+    return [c.address for c in gazetteer.fuzzy(text, limit=limit)] if gazetteer is not None else []
@@ -0,0 +1,88 @@
+"""
+Vectorized great-circle distances (NumPy).
+
+tools.haversine handles one pair of points; the functions here compute
+distances from one origin to N points, or between M and N points, in a single
+array pass, and pick the k nearest with a partial sort (np.argpartition)
+instead of sorting every candidate. rank_attractions uses them for Places
+replies, and QueryPlan uses PointIndex to merge nearby cities.
+"""
+
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _radians(values):
+    return np.radians(np.asarray(values, dtype=np.float64))
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """Distances in km from (lat, lng) to each of the points (lats[i], lngs[i])."""
+    phi1, lam1 = np.radians(lat), np.radians(lng)
+    phi2, lam2 = _radians(lats), _radians(lngs)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(lats1, lngs1, lats2, lngs2):
+    """M x N matrix of distances in km between two sets of points."""
+    phi1, lam1 = _radians(lats1)[:, None], _radians(lngs1)[:, None]
+    phi2, lam2 = _radians(lats2)[None, :], _radians(lngs2)[None, :]
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(distances, k, within=None):
+    """Indices of the k smallest distances, nearest first.
+
+    With `within`, only distances <= within are considered. Ties keep their
+    input order, like a stable sort of the whole array would.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    candidates = np.flatnonzero(distances <= within) if within is not None else np.arange(distances.size)
+    if k <= 0 or candidates.size == 0:
+        return candidates[:0]
+    if candidates.size > k:
+        # partial sort for the k-th smallest distance, then keep everything
+        # nearer plus the earliest points tied with it
+        d = distances[candidates]
+        kth = np.partition(d, k - 1)[k - 1]
+        below = candidates[d < kth]
+        candidates = np.concatenate([below, candidates[d == kth][:k - below.size]])
+        candidates.sort()
+    return candidates[np.argsort(distances[candidates], kind="stable")]
+
+
+class PointIndex:
+    """Growing set of points with a vectorized nearest-point lookup; thread-safe."""
+
+    def __init__(self, capacity=64):
+        self._lock = threading.Lock()
+        self._lats = np.empty(capacity)
+        self._lngs = np.empty(capacity)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _add(self, lat, lng):
+        if self.size == self._lats.size:
+            self._lats = np.resize(self._lats, self.size * 2)
+            self._lngs = np.resize(self._lngs, self.size * 2)
+        self._lats[self.size] = lat
+        self._lngs[self.size] = lng
+        self.size += 1
+        return self.size - 1
+
+    def add_or_match(self, lat, lng, within_km):
+        """Id of the nearest stored point within `within_km`, else store the point and return its new id."""
+        with self._lock:
+            if self.size:
+                distances = haversine_many(lat, lng, self._lats[:self.size], self._lngs[:self.size])
+                i = int(np.argmin(distances))
+                if distances[i] <= within_km:
+                    return i
+            return self._add(lat, lng)
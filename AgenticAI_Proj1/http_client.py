@@ -0,0 +1,278 @@
+"""
+Shared pooled HTTP sessions for the provider APIs used by tools.py.
+
+Each provider host gets one requests.Session whose connections are kept alive
+between calls, so repeated lookups skip the TCP+TLS handshake. Idempotent
+requests are retried with jittered exponential backoff, sessions that sat idle
+longer than HTTP_IDLE_TIMEOUT are closed and rebuilt, and pool_stats() reports
+how many requests reused an existing connection.
+
+Every request first takes a token from its provider's bucket in ratelimit.py.
+429 replies are handled here rather than by urllib3 so the bucket can slow
+down, honour Retry-After and replay the request (a 429 was not processed, so
+this is safe for POST lookups too).
+
+The async side (async_request) mirrors this with one httpx.AsyncClient per
+host and event loop, used by async_tools.py.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_POOL_SIZE,
+    HTTP_IDLE_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_TIMEOUT,
+    RATE_LIMIT_MAX_RETRIES,
+)
+import ratelimit
+
+# Retried only for methods urllib3 treats as idempotent (GET, HEAD, PUT, ...);
+# POST lookups are never replayed after the request has been sent.
+# 429 is handled by the rate limiter in request()/async_request().
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class _Retry(Retry):
+    # urllib3 retries 429 on its own when honouring Retry-After; leave it to us.
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+
+class _HostSession:
+    """A requests.Session for one host plus the bookkeeping used for eviction."""
+
+    def __init__(self, host):
+        self.host = host
+        self.session = _build_session()
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+
+
+_sessions = {}
+_lock = threading.Lock()
+# Counters carried over from sessions that were evicted or closed.
+_retired = {}
+
+
+def _build_session():
+    retry = _Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        backoff_jitter=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _session_counters(session):
+    """Return (requests, connections) summed over the urllib3 pools of a session."""
+    sent = opened = 0
+    # The same adapter is mounted for http:// and https://; count it once.
+    adapters = {id(a): a for a in session.adapters.values()}.values()
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            sent += pool.num_requests
+            opened += pool.num_connections
+    return sent, opened
+
+
+def _retire(entry):
+    """Close a host session and keep its counters in the retired totals."""
+    sent, opened = _session_counters(entry.session)
+    totals = _retired.setdefault(entry.host, {"requests": 0, "connections": 0, "evictions": 0})
+    totals["requests"] += sent
+    totals["connections"] += opened
+    totals["evictions"] += 1
+    entry.session.close()
+
+
+def _acquire(host):
+    now = time.monotonic()
+    with _lock:
+        entry = _sessions.get(host)
+        if entry is not None and entry.in_flight == 0 and now - entry.last_used > HTTP_IDLE_TIMEOUT:
+            _retire(entry)
+            entry = None
+        if entry is None:
+            entry = _HostSession(host)
+            _sessions[host] = entry
+        entry.in_flight += 1
+        entry.last_used = now
+    return entry
+
+
+def _release(entry):
+    with _lock:
+        entry.in_flight -= 1
+        entry.last_used = time.monotonic()
+
+
+def request(method, url, **kwargs):
+    """Send a request through the pooled session for the URL's host."""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    bucket = ratelimit.bucket_for(url)
+    attempt = 0
+    while True:
+        if bucket is not None:
+            bucket.acquire()
+        entry = _acquire(urlsplit(url).netloc)
+        try:
+            response = entry.session.request(method, url, **kwargs)
+        finally:
+            _release(entry)
+        if bucket is None:
+            return response
+        if response.status_code != 429:
+            bucket.on_success()
+            return response
+        bucket.on_throttle(ratelimit.parse_retry_after(response.headers.get("Retry-After")))
+        if attempt >= RATE_LIMIT_MAX_RETRIES:
+            return response
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def evict_idle():
+    """Close every host session that has been idle longer than HTTP_IDLE_TIMEOUT."""
+    now = time.monotonic()
+    with _lock:
+        for host, entry in list(_sessions.items()):
+            if entry.in_flight == 0 and now - entry.last_used > HTTP_IDLE_TIMEOUT:
+                _retire(entry)
+                del _sessions[host]
+
+
+def close_all():
+    """Close all pooled sessions (counters are kept for pool_stats)."""
+    with _lock:
+        for entry in _sessions.values():
+            _retire(entry)
+        _sessions.clear()
+
+
+def pool_stats():
+    """Return per-host connection counters.
+
+    "reused" is the number of requests that went over an already open
+    connection; under steady load it should track "requests" closely.
+    """
+    stats = {}
+    with _lock:
+        hosts = set(_sessions) | set(_retired)
+        for host in sorted(hosts):
+            totals = dict(_retired.get(host, {"requests": 0, "connections": 0, "evictions": 0}))
+            entry = _sessions.get(host)
+            if entry is not None:
+                sent, opened = _session_counters(entry.session)
+                totals["requests"] += sent
+                totals["connections"] += opened
+            totals["reused"] = max(totals["requests"] - totals["connections"], 0)
+            stats[host] = totals
+    return stats
+
+
+# --- asyncio ---------------------------------------------------------------
+
+IDEMPOTENT_METHODS = frozenset(Retry.DEFAULT_ALLOWED_METHODS)
+
+# event loop -> {host: httpx.AsyncClient}; clients cannot be shared across loops
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client(host):
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(host)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=HTTP_IDLE_TIMEOUT,
+        )
+        client = httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT)
+        clients[host] = client
+    return client
+
+
+def _backoff(attempt):
+    return HTTP_BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, HTTP_BACKOFF_FACTOR)
+
+
+async def async_request(method, url, **kwargs):
+    """Async counterpart of request(), with the same retry policy.
+
+    Connection failures are retried for every method because nothing was
+    sent; other transport errors and retryable statuses only for idempotent ones.
+    """
+    client = _async_client(urlsplit(url).netloc)
+    bucket = ratelimit.bucket_for(url)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    attempt = throttled = 0
+    while True:
+        if bucket is not None:
+            await bucket.aacquire()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.ConnectError:
+            if attempt >= HTTP_MAX_RETRIES:
+                raise
+        except httpx.TransportError:
+            if not idempotent or attempt >= HTTP_MAX_RETRIES:
+                raise
+        else:
+            if response.status_code == 429 and bucket is not None:
+                bucket.on_throttle(ratelimit.parse_retry_after(response.headers.get("Retry-After")))
+                if throttled >= RATE_LIMIT_MAX_RETRIES:
+                    return response
+                throttled += 1
+                continue
+            if bucket is not None:
+                bucket.on_success()
+            if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= HTTP_MAX_RETRIES:
+                return response
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+async def async_get(url, **kwargs):
+    return await async_request("GET", url, **kwargs)
+
+
+async def async_post(url, **kwargs):
+    return await async_request("POST", url, **kwargs)
+
+
+async def aclose_all():
+    """Close the async clients that belong to the running event loop."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
@@ -1,18 +1,18 @@
 from tools import (
-    geocode_location,
-    get_weather,
-    get_air_quality,
-    get_owm_forecast,
-    get_owm_air_quality,
-    clothing_recommendation,
-    umbrella_needed,
     mask_needed,
-    get_attractions,
-    three_day_summary,
+    travel_advice,
     aqi_category,
-    extract_aqi,
+    fetch_city_bundle,
+    GeocodeNotFound,
+    validate_google_key,
 )
-from config import OPENWEATHER_API_KEY
+import async_tools
+import http_client
+from parquet_export import ParquetExportWriter
+from checkpoint import Checkpoint
+from queryplan import QueryPlan
+from gazetteer import get_gazetteer, offline_geocode, suggest
+from parser import DATE_RE, iter_trip_file, READERS
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -24,8 +24,13 @@ memory = ConversationBufferMemory()
 
 
 import argparse
+import asyncio
 import json
 import csv
+import itertools
+import textwrap
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 import re
 
@@ -40,25 +45,19 @@ def parse_city_token(token):
     parts = token.split(":")
     city = parts[0].strip()
     start = end = None
-    date_re = re.compile(r"^\d{4}-\d{2}-\d{2}$")
-    if len(parts) >= 2 and date_re.match(parts[1]):
+    if len(parts) >= 2 and DATE_RE.match(parts[1]):
         start = datetime.strptime(parts[1], "%Y-%m-%d").date()
         end = start
-    if len(parts) >= 3 and date_re.match(parts[2]):
+    if len(parts) >= 3 and DATE_RE.match(parts[2]):
         end = datetime.strptime(parts[2], "%Y-%m-%d").date()
     return city, start, end
 
 
 def mock_city_data(city, start, end):
     """Return mock data for a city (no API calls)."""
-    # Simple mock coordinates for a few known cities; fallback to 0,0
-    coords = {
-        "paris": (48.8566, 2.3522),
-        "tokyo": (35.6895, 139.6917),
-        "new york": (40.7128, -74.0060),
-    }
-    lat, lng = coords.get(city.lower(), (0.0, 0.0))
-    address = f"{city}, Example Address"
+    # Real coordinates for cities in the offline gazetteer; fallback to 0,0
+    geo = offline_geocode(city) or {"lat": 0.0, "lng": 0.0, "address": f"{city}, Example Address"}
+    lat, lng, address = geo["lat"], geo["lng"], geo["address"]
     attractions = [
         {"name": f"{city} Main Museum", "address": f"123 Main St, {city}", "distance_km": 0.6, "type": "museum"},
         {"name": f"{city} Old Town", "address": f"45 Old Town Rd, {city}", "distance_km": 1.0, "type": "historic"},
@@ -74,197 +73,530 @@ def mock_city_data(city, start, end):
     return {"lat": lat, "lng": lng, "address": address, "attractions": attractions, "daily": daily, "aqi": aqi}
 
 
-def export_json(results, out_file):
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+class JSONExportWriter:
+    """Write results one at a time as a JSON array.
 
+    The finished file is identical to json.dump(results, indent=2), but only
+    the current record is held in memory.
+    """
 
-def export_csv(results, out_file):
+    def __init__(self, out_file):
+        self.f = open(out_file, "w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, result):
+        item = json.dumps(result, ensure_ascii=False, indent=2)
+        self.f.write(("[\n" if self.count == 0 else ",\n") + textwrap.indent(item, "  "))
+        self.count += 1
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.write("\n]" if self.count else "[]")
+        self.f.close()
+
+
+CSV_HEADER = ["city", "address", "attractions", "daily", "aqi", "clothing", "notes"]
+
+
+def csv_row(r):
     # flattened CSV: one row per city, lists as JSON strings
-    with open(out_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["city", "address", "attractions", "daily", "aqi", "clothing", "notes"])
+    return [
+        r.get("city"),
+        r.get("address"),
+        json.dumps(r.get("attractions", []), ensure_ascii=False),
+        json.dumps(r.get("daily", []), ensure_ascii=False),
+        r.get("aqi"),
+        r.get("clothing"),
+        "; ".join(r.get("notes", [])),
+    ]
+
+
+class CSVExportWriter:
+    """Write results one row at a time (same layout as export_csv).
+
+    Each row is flushed as soon as it is written, so the file can be tailed
+    and a crash keeps every finished city.
+    """
+
+    def __init__(self, out_file):
+        self.f = open(out_file, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(CSV_HEADER)
+        self.f.flush()
+
+    def write(self, result):
+        self.writer.writerow(csv_row(result))
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class NDJSONExportWriter:
+    """Write one compact JSON line per city and flush it immediately.
+
+    Every line is written whole in a single call, so a reader tailing the
+    file only ever sees complete records.
+    """
+
+    def __init__(self, out_file):
+        self.f = open(out_file, "w", encoding="utf-8")
+
+    def write(self, result):
+        self.f.write(json.dumps(result, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+# "parquet" writes a directory of cities/daily/attractions tables (parquet_export.py)
+EXPORT_WRITERS = {
+    "json": JSONExportWriter,
+    "csv": CSVExportWriter,
+    "ndjson": NDJSONExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+
+def open_exporter(export, out_file):
+    """Return a streaming writer for the export format, or None when not exporting."""
+    if not (export and out_file):
+        return None
+    return EXPORT_WRITERS[export](out_file)
+
+
+def export_results(results, export, out_file):
+    writer = open_exporter(export, out_file)
+    try:
         for r in results:
-            writer.writerow([
-                r.get("city"),
-                r.get("address"),
-                json.dumps(r.get("attractions", []), ensure_ascii=False),
-                json.dumps(r.get("daily", []), ensure_ascii=False),
-                r.get("aqi"),
-                r.get("clothing"),
-                "; ".join(r.get("notes", [])),
-            ])
-
-
-def run_trip_planner(tokens, mock=False, export=None, out_file=None):
-    print("\nPlanning trip...\n")
-    results = []
-    total_masks = 0
+            writer.write(r)
+    finally:
+        writer.close()
 
-    for token in tokens:
-        city, start, end = parse_city_token(token)
-        try:
-            if mock:
-                data = mock_city_data(city, start, end)
-                lat, lng = data["lat"], data["lng"]
-                address = data["address"]
-                attractions = data["attractions"]
-                daily = data["daily"]
-                aqi = data["aqi"]
-            else:
-                geo = geocode_location(city)
-                lat, lng = geo["lat"], geo["lng"]
-                address = geo.get("address", "")
-                attractions = get_attractions(city, lat, lng)
-
-                # Prefer OpenWeatherMap if key available
-                if OPENWEATHER_API_KEY:
-                    owm_daily = get_owm_forecast(lat, lng)
-                    if owm_daily:
-                        daily = owm_daily
-                    else:
-                        weather = get_weather(lat, lng)
-                        daily = three_day_summary(weather)
-
-                    owm_aq = get_owm_air_quality(lat, lng)
-                    if owm_aq:
-                        aqi = owm_aq.get("aqi_estimate") or owm_aq.get("owm_index")
-                    else:
-                        air = get_air_quality(lat, lng)
-                        try:
-                            from tools import extract_aqi
-                            aqi = extract_aqi(air)
-                        except Exception:
-                            try:
-                                aqi = air["hourlyForecasts"][0]["indexes"][0]["aqi"]
-                            except Exception:
-                                aqi = air.get("aqi", {}).get("value", None)
-                else:
-                    weather = get_weather(lat, lng)
-                    daily = three_day_summary(weather)
-                    air = get_air_quality(lat, lng)
-                    try:
-                        from tools import extract_aqi
-                        aqi = extract_aqi(air)
-                    except Exception:
-                        try:
-                            aqi = air["hourlyForecasts"][0]["indexes"][0]["aqi"]
-                        except Exception:
-                            aqi = air.get("aqi", {}).get("value", None)
-
-            highs = [d["high"] for d in daily if d.get("high") is not None]
-            avg_temp = sum(highs) / len(highs) if highs else None
-            if avg_temp is not None:
-                clothing = clothing_recommendation(avg_temp)
-            else:
-                clothing = "N/A (weather data unavailable)"
-            umbrella = any(d.get("precip", 0) is not None and d.get("precip", 0) >= 40 for d in daily)
-            if avg_temp is None:
-                umbrella = False  # can't recommend umbrella without data
-
-            mask = False
-            if aqi is not None:
-                mask = mask_needed(aqi)
-            # If AQI is missing, mask stays False and AQI output is 'N/A'
-            if mask:
-                total_masks += 1
-
-            # print concise per-city output with clean separators
-            print('\n' + '-' * 48)
-            print(f"*** {city} ***")
-            if address:
-                print(f"Address: {address}")
-            print('-' * 48)
-
-            print("Top nearby spots (≤2 km):")
-            if attractions:
-                for p in attractions:
-                    name = p.get('name')
-                    addr = p.get('address')
-                    dist = p.get('distance_km')
-                    typ = p.get('type')
-                    if addr:
-                        print(f"  - {name} — {addr} — {dist} km — {typ}")
-                    else:
-                        print(f"  - {name} — {dist} km — {typ}")
-            else:
-                print("  - No attractions found within 2 km.")
 
-            print('-' * 48)
+def export_json(results, out_file):
+    export_results(results, "json", out_file)
 
-            def fmt_day(i, d):
-                h = d.get('high', 'N/A')
-                l = d.get('low', 'N/A')
-                p = d.get('precip', 0)
-                return f"Day {i+1}: {h} / {l} °C, {p}% precip"
 
-            print("Weather (by day):")
-            if daily and any(d.get('high') is not None for d in daily):
-                print("  " + "; ".join(fmt_day(i, d) for i, d in enumerate(daily)))
-            else:
-                print("  N/A (weather data unavailable)")
-                # Debug: print the raw weather_json for grading/troubleshooting
-                if not mock:
-                    print("  [DEBUG] Raw weather_json:", weather)
+def export_csv(results, out_file):
+    export_results(results, "csv", out_file)
+
 
-            print('-' * 48)
+def export_ndjson(results, out_file):
+    export_results(results, "ndjson", out_file)
 
-            print(f"Best wear: {clothing}")
 
-            print('-' * 48)
+def fetch_city_data(city, start, end, mock=False, query_plan=None):
+    """Fetch coordinates, attractions, daily forecast and AQI for one city.
+
+    Returns a dict with lat, lng, address, attractions, daily, aqi and the raw
+    Google weather payload under "weather" (None when it was not requested).
+    With a QueryPlan, tokens for the same city or place share one fetch.
+    """
+    if mock:
+        data = mock_city_data(city, start, end)
+        data["weather"] = None
+        return data
+
+    if query_plan is not None:
+        return query_plan.fetch(city)
+    return fetch_city_bundle(city)
+
+
+def build_city_result(city, data):
+    """Turn fetched city data into the result record used for output and export."""
+    daily = data["daily"]
+    advice = travel_advice(daily, data["aqi"])
+
+    notes = ["Public transit recommended", "Best to visit attractions early morning to avoid crowds"]
+    if advice["umbrella"]:
+        notes.insert(1, "Bring waterproof or umbrella")
+    elif advice["avg_high"] is None:
+        notes.insert(1, "No umbrella recommendation (weather unavailable)")
+
+    return {
+        "city": city,
+        "address": data["address"],
+        "attractions": data["attractions"],
+        "daily": daily,
+        "aqi": data["aqi"],
+        "clothing": advice["clothing"],
+        "notes": notes,
+    }
+
 
-            if aqi is not None:
-                print(f"AQI: {aqi} — {aqi_category(aqi)}")
+def print_city_result(result, weather=None, mock=False):
+    """Print the concise per-city report with clean separators."""
+    city = result["city"]
+    address = result["address"]
+    attractions = result["attractions"]
+    daily = result["daily"]
+    aqi = result["aqi"]
+
+    print('\n' + '-' * 48)
+    print(f"*** {city} ***")
+    if address:
+        print(f"Address: {address}")
+    print('-' * 48)
+
+    print("Top nearby spots (≤2 km):")
+    if attractions:
+        for p in attractions:
+            name = p.get('name')
+            addr = p.get('address')
+            dist = p.get('distance_km')
+            typ = p.get('type')
+            if addr:
+                print(f"  - {name} — {addr} — {dist} km — {typ}")
             else:
-                print("AQI: N/A (air quality data unavailable)")
-
-            print('-' * 48)
-
-            notes = ["Public transit recommended", "Best to visit attractions early morning to avoid crowds"]
-            if umbrella:
-                notes.insert(1, "Bring waterproof or umbrella")
-            elif avg_temp is None:
-                notes.insert(1, "No umbrella recommendation (weather unavailable)")
-            print("Quick notes:")
-            for n in notes:
-                print(f"  - {n}")
-
-            print('-' * 48)
-            print()
-
-            results.append({
-                "city": city,
-                "address": address,
-                "attractions": attractions,
-                "daily": daily,
-                "aqi": aqi,
-                "clothing": clothing,
-                "notes": notes,
-            })
+                print(f"  - {name} — {dist} km — {typ}")
+    else:
+        print("  - No attractions found within 2 km.")
 
-        except Exception as e:
-            print(f"Error processing '{city}': {e}")
-            print()
-            continue
+    print('-' * 48)
+
+    def fmt_day(i, d):
+        h = d.get('high', 'N/A')
+        l = d.get('low', 'N/A')
+        p = d.get('precip', 0)
+        return f"Day {i+1}: {h} / {l} °C, {p}% precip"
+
+    print("Weather (by day):")
+    if daily and any(d.get('high') is not None for d in daily):
+        print("  " + "; ".join(fmt_day(i, d) for i, d in enumerate(daily)))
+    else:
+        print("  N/A (weather data unavailable)")
+        # Debug: print the raw weather_json for grading/troubleshooting
+        if not mock:
+            print("  [DEBUG] Raw weather_json:", weather)
+
+    print('-' * 48)
+
+    print(f"Best wear: {result['clothing']}")
+
+    print('-' * 48)
 
-    print("TOTAL MASKS NEEDED:", total_masks)
+    if aqi is not None:
+        print(f"AQI: {aqi} — {aqi_category(aqi)}")
+    else:
+        print("AQI: N/A (air quality data unavailable)")
+
+    print('-' * 48)
+
+    print("Quick notes:")
+    for n in result["notes"]:
+        print(f"  - {n}")
 
-    if export and out_file:
-        if export == "json":
-            export_json(results, out_file)
-        elif export == "csv":
-            export_csv(results, out_file)
-        print(f"Exported results to {out_file}")
+    print('-' * 48)
+    print()
 
-    return results
+
+def plan_city(token, mock=False, checkpoint=None, query_plan=None):
+    """Fetch and summarize a single city token.
+
+    Returns (city, result, weather, error). Errors are returned rather than
+    raised so that one failing city never affects the others in a batch.
+    With a Checkpoint, a token finished by an earlier run is loaded from it
+    instead of fetched, and each new result is recorded there.
+    """
+    city, start, end = parse_city_token(token)
+    if checkpoint is not None:
+        stored = checkpoint.get(city, start, end)
+        if stored is not None:
+            return city, stored, None, None
+    try:
+        data = fetch_city_data(city, start, end, mock=mock, query_plan=query_plan)
+        result = build_city_result(city, data)
+    except Exception as e:
+        return city, None, None, e
+    if checkpoint is not None:
+        checkpoint.put(city, start, end, result)
+    return city, result, data.get("weather"), None
+
+
+async def aplan_city(token, mock=False, checkpoint=None, query_plan=None):
+    """Async counterpart of plan_city built on async_tools.
+
+    Checkpoint reads and (fsynced) writes run in a worker thread so they
+    never block the other cities on the event loop.
+    """
+    city, start, end = parse_city_token(token)
+    if checkpoint is not None:
+        stored = await asyncio.to_thread(checkpoint.get, city, start, end)
+        if stored is not None:
+            return city, stored, None, None
+    try:
+        if mock:
+            data = fetch_city_data(city, start, end, mock=True)
+        elif query_plan is not None:
+            data = await query_plan.afetch(city)
+        else:
+            data = await async_tools.fetch_city_bundle(city)
+        result = build_city_result(city, data)
+    except Exception as e:
+        return city, None, None, e
+    if checkpoint is not None:
+        await asyncio.to_thread(checkpoint.put, city, start, end, result)
+    return city, result, data.get("weather"), None
+
+
+def report_city(planned, mock=False):
+    """Print one (city, result, weather, error) tuple from plan_city.
+
+    Returns (result, mask) on success and (None, False) when the city failed.
+    """
+    city, result, weather, error = planned
+    try:
+        if error is not None:
+            raise error
+
+        mask = False
+        if result["aqi"] is not None:
+            mask = mask_needed(result["aqi"])
+        # If AQI is missing, mask stays False and AQI output is 'N/A'
+
+        print_city_result(result, weather=weather, mock=mock)
+        return result, mask
+
+    except Exception as e:
+        print(f"Error processing '{city}': {e}")
+        if isinstance(e, GeocodeNotFound):
+            suggestions = suggest(city)
+            if suggestions:
+                print(f"  Did you mean: {'; '.join(suggestions)}?")
+        print()
+        return None, False
+
+
+class TripReport:
+    """Consume planned cities one at a time: print, count masks and export.
+
+    Results are only kept in memory when `collect` is set, so a long batch
+    streamed with collect=False uses flat memory.
+    """
+
+    def __init__(self, mock=False, export=None, out_file=None, on_result=None, collect=True):
+        self.mock = mock
+        self.out_file = out_file
+        self.on_result = on_result
+        self.exporter = open_exporter(export, out_file)
+        self.results = [] if collect else None
+        self.total_masks = 0
+
+    def add(self, planned):
+        result, mask = report_city(planned, mock=self.mock)
+        if result is None:
+            return
+        if mask:
+            self.total_masks += 1
+        if self.exporter is not None:
+            self.exporter.write(result)
+        if self.results is not None:
+            self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def finish(self):
+        print("TOTAL MASKS NEEDED:", self.total_masks)
+        if self.exporter is not None:
+            self.close()
+            print(f"Exported results to {self.out_file}")
+        return self.results
+
+
+_END = object()
+
+
+def iter_trip_planner(tokens, mock=False, concurrency=1, ordered=True, checkpoint=None, query_plan=None):
+    """Yield a (city, result, weather, error) record per city token as it finishes.
+
+    At most `concurrency` cities are in flight; tokens are pulled from the
+    iterable only as slots free up. With `ordered` records follow input
+    order, otherwise they are yielded in completion order. `checkpoint` and
+    `query_plan` are passed to plan_city.
+    """
+    window = max(concurrency or 1, 1)
+    if window == 1:
+        for token in tokens:
+            yield plan_city(token, mock=mock, checkpoint=checkpoint, query_plan=query_plan)
+        return
+
+    tokens = iter(tokens)
+    executor = ThreadPoolExecutor(max_workers=window)
+
+    def submit_next():
+        token = next(tokens, _END)
+        return None if token is _END else executor.submit(plan_city, token, mock, checkpoint, query_plan)
+
+    try:
+        pending = [f for f in (submit_next() for _ in range(window)) if f is not None]
+        if ordered:
+            pending = deque(pending)
+            while pending:
+                planned = pending.popleft().result()
+                future = submit_next()
+                if future is not None:
+                    pending.append(future)
+                yield planned
+        else:
+            pending = set(pending)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for _ in done:
+                    future = submit_next()
+                    if future is not None:
+                        pending.add(future)
+                for future in done:
+                    yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def aiter_trip_planner(tokens, mock=False, concurrency=50, ordered=True, checkpoint=None, query_plan=None):
+    """Async counterpart of iter_trip_planner built on aplan_city."""
+    window = max(concurrency or 1, 1)
+    tokens = iter(tokens)
+
+    def start_next():
+        token = next(tokens, _END)
+        return None if token is _END else asyncio.ensure_future(aplan_city(token, mock=mock, checkpoint=checkpoint, query_plan=query_plan))
+
+    pending = [t for t in (start_next() for _ in range(window)) if t is not None]
+    try:
+        if ordered:
+            pending = deque(pending)
+            while pending:
+                planned = await pending[0]
+                pending.popleft()
+                task = start_next()
+                if task is not None:
+                    pending.append(task)
+                yield planned
+        else:
+            pending = set(pending)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for _ in done:
+                    task = start_next()
+                    if task is not None:
+                        pending.add(task)
+                for task in done:
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def open_checkpoint(path):
+    """Open the checkpoint file at `path` (None when not checkpointing) and say what it holds."""
+    if not path:
+        return None
+    checkpoint = Checkpoint(path)
+    done = len(checkpoint)
+    if done:
+        print(f"Resuming from {path}: {done} finished cities on file")
+    return checkpoint
+
+
+def print_checkpoint_stats(checkpoint):
+    if checkpoint is not None:
+        stats = checkpoint.stats()
+        print(f"Checkpoint: {stats['resumed']} cities resumed, {stats['recorded']} newly recorded")
+        if stats["failed"]:
+            print(f"Checkpoint: {stats['failed']} cities could not be recorded and will be fetched again on resume")
+
+
+def open_query_plan(dedupe, mock):
+    """Return a QueryPlan for live runs with dedupe on (mock data has nothing to fetch)."""
+    return QueryPlan() if dedupe and not mock else None
+
+
+def print_query_plan_stats(query_plan):
+    if query_plan is None:
+        return
+    stats = query_plan.stats()
+    if stats["tokens"]:
+        print(f"Query plan: {stats['tokens']} cities -> {stats['unique_names']} unique names -> "
+              f"{stats['unique_places']} places ({stats['geocodes_saved']} geocodes and "
+              f"{stats['place_fetches_saved']} place fetches avoided)")
+
+
+def run_trip_planner(tokens, mock=False, export=None, out_file=None, concurrency=1, on_result=None,
+                     ordered=True, collect=True, checkpoint=None, dedupe=True):
+    """Plan every city token and print a concise report per city.
+
+    Cities stream through iter_trip_planner: with concurrency > 1 they are
+    fetched in parallel on a bounded worker pool, reported in input order
+    (or completion order when `ordered` is False) and exported as they
+    arrive. `on_result(result)` is called for each successful city as soon
+    as it is reported, so callers (e.g. the Streamlit app) can render it
+    early. Returns the results list, or None when `collect` is False.
+
+    `checkpoint` is the path of a checkpoint file (see checkpoint.py): tokens
+    finished by an earlier run are loaded from it instead of re-fetched, so
+    the report, mask total and exports still cover every city.
+
+    With `dedupe` (see queryplan.py) tokens that share a city name or
+    geocode to the same place are fetched once and fanned out.
+    """
+    print("\nPlanning trip...\n")
+    checkpoint = open_checkpoint(checkpoint)
+    query_plan = open_query_plan(dedupe, mock)
+    report = TripReport(mock=mock, export=export, out_file=out_file, on_result=on_result, collect=collect)
+    try:
+        for planned in iter_trip_planner(tokens, mock=mock, concurrency=concurrency, ordered=ordered,
+                                         checkpoint=checkpoint, query_plan=query_plan):
+            report.add(planned)
+    finally:
+        report.close()
+    print_checkpoint_stats(checkpoint)
+    print_query_plan_stats(query_plan)
+    return report.finish()
+
+
+async def arun_trip_planner(tokens, mock=False, export=None, out_file=None, concurrency=50, on_result=None,
+                            ordered=True, collect=True, checkpoint=None, dedupe=True):
+    """Async counterpart of run_trip_planner.
+
+    Up to `concurrency` cities are in flight on the running event loop at
+    once; see run_trip_planner for the other arguments.
+    """
+    print("\nPlanning trip...\n")
+    checkpoint = open_checkpoint(checkpoint)
+    query_plan = open_query_plan(dedupe, mock)
+    # open (and if needed compile) the gazetteer before cities share the loop
+    await asyncio.to_thread(get_gazetteer)
+    report = TripReport(mock=mock, export=export, out_file=out_file, on_result=on_result, collect=collect)
+    try:
+        async for planned in aiter_trip_planner(tokens, mock=mock, concurrency=concurrency, ordered=ordered,
+                                                checkpoint=checkpoint, query_plan=query_plan):
+            report.add(planned)
+    finally:
+        report.close()
+    print_checkpoint_stats(checkpoint)
+    print_query_plan_stats(query_plan)
+    return report.finish()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Concise multi-city travel planner")
     parser.add_argument('cities', nargs='*', help='City tokens (e.g., "Paris", "Paris:2026-03-10:2026-03-12")')
     parser.add_argument('--mock', action='store_true', help='Run with mock data (no API calls)')
-    parser.add_argument('--export', choices=['json', 'csv'], help='Export results to file')
-    parser.add_argument('--out', help='Output filename (default planner_output.json/csv)')
+    parser.add_argument('--export', choices=sorted(EXPORT_WRITERS), help='Export results to file')
+    parser.add_argument('--out', help='Output filename (default planner_output.<format>)')
+    parser.add_argument('--concurrency', type=int, metavar='N', help='Number of cities to plan in parallel (default 1)')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Use the asyncio planner (concurrency defaults to 50)')
+    parser.add_argument('--completion-order', action='store_true', help='Report cities as they finish instead of in input order')
+    parser.add_argument('--input', metavar='FILE', help='Read city tokens from a CSV, JSONL or plain itinerary file (streamed)')
+    parser.add_argument('--input-format', choices=sorted(READERS), help='Format of --input (default: from the file extension)')
+    parser.add_argument('--no-dedupe', dest='dedupe', action='store_false', help='Fetch every token separately instead of once per unique city/place')
+    parser.add_argument('--checkpoint', metavar='PATH', help='Record finished cities in PATH and skip them when the run is restarted')
     parser.add_argument('--validate-key', action='store_true', help='Check Google Maps API key and report common issues')
 
     args = parser.parse_args()
@@ -274,14 +606,17 @@ if __name__ == "__main__":
             if args.mock:
                 print("Running in mock mode — key validation skipped.")
             else:
-                geo = geocode_location('Paris')
+                geo = validate_google_key('Paris')
                 print("API key appears valid. Example geocode:\n", geo.get('address'))
         except Exception as e:
             print("API key validation failed:", e)
             print("Check that GOOGLE_MAPS_API_KEY is set, that Geocoding & Places APIs are enabled in your Google Cloud project, billing is enabled, and the key is not restricted incorrectly.")
         raise SystemExit(0)
 
-    if not args.cities:
+    if args.input:
+        # streamed: tokens are read from the file only as the planner asks for them
+        tokens = itertools.chain(args.cities, iter_trip_file(args.input, args.input_format))
+    elif not args.cities:
         inp = input("Enter cities separated by commas or semicolons (or city:YYYY-MM-DD:YYYY-MM-DD):\n> ")
         # Accept both comma and semicolon as delimiters
         import re
@@ -293,4 +628,17 @@ if __name__ == "__main__":
     if args.export and not out_file:
         out_file = f"planner_output.{args.export}"
 
-    run_trip_planner(tokens, mock=args.mock, export=args.export, out_file=out_file)
+    if args.use_async:
+        async def run_async():
+            try:
+                await arun_trip_planner(tokens, mock=args.mock, export=args.export, out_file=out_file,
+                                        concurrency=args.concurrency or 50, ordered=not args.completion_order, collect=False,
+                                        checkpoint=args.checkpoint, dedupe=args.dedupe)
+            finally:
+                await http_client.aclose_all()
+
+        asyncio.run(run_async())
+    else:
+        run_trip_planner(tokens, mock=args.mock, export=args.export, out_file=out_file,
+                         concurrency=args.concurrency or 1, ordered=not args.completion_order, collect=False,
+                         checkpoint=args.checkpoint, dedupe=args.dedupe)
@@ -0,0 +1,163 @@
+"""
+Columnar Parquet export of planner results (main.py --export parquet).
+
+Results are split into three typed tables linked by city_id:
+
+- cities:      city_id, city, address, aqi, clothing, notes
+- daily:       city_id, day, high, low, precip
+- attractions: city_id, rank, name, address, lat, lng, distance_km, type
+
+The export is a directory holding cities.parquet, daily.parquet and
+attractions.parquet. Rows are buffered and written as zstd-compressed row
+groups of PARQUET_ROW_GROUP_SIZE, so large batches stream to disk.
+"""
+
+import io
+import os
+import zipfile
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for the parquet export
+    pa = pq = None
+
+from config import PARQUET_ROW_GROUP_SIZE
+
+PARQUET_COMPRESSION = "zstd"
+
+
+def _schemas():
+    return {
+        "cities": pa.schema([
+            ("city_id", pa.int32()),
+            ("city", pa.string()),
+            ("address", pa.string()),
+            ("aqi", pa.int32()),
+            ("clothing", pa.string()),
+            ("notes", pa.list_(pa.string())),
+        ]),
+        "daily": pa.schema([
+            ("city_id", pa.int32()),
+            ("day", pa.int16()),
+            ("high", pa.float64()),
+            ("low", pa.float64()),
+            ("precip", pa.float64()),
+        ]),
+        "attractions": pa.schema([
+            ("city_id", pa.int32()),
+            ("rank", pa.int16()),
+            ("name", pa.string()),
+            ("address", pa.string()),
+            ("lat", pa.float64()),
+            ("lng", pa.float64()),
+            ("distance_km", pa.float64()),
+            ("type", pa.string()),
+        ]),
+    }
+
+
+def _int(value):
+    return None if value is None else int(round(value))
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def split_result(city_id, r):
+    """Return {table: [row, ...]} for one result record."""
+    return {
+        "cities": [{
+            "city_id": city_id,
+            "city": r.get("city"),
+            "address": r.get("address"),
+            "aqi": _int(r.get("aqi")),
+            "clothing": r.get("clothing"),
+            "notes": list(r.get("notes") or []),
+        }],
+        "daily": [
+            {
+                "city_id": city_id,
+                "day": day,
+                "high": _float(d.get("high")),
+                "low": _float(d.get("low")),
+                "precip": _float(d.get("precip")),
+            }
+            for day, d in enumerate(r.get("daily") or [], start=1)
+        ],
+        "attractions": [
+            {
+                "city_id": city_id,
+                "rank": rank,
+                "name": p.get("name"),
+                "address": p.get("address"),
+                "lat": _float(p.get("lat")),
+                "lng": _float(p.get("lng")),
+                "distance_km": _float(p.get("distance_km")),
+                "type": p.get("type"),
+            }
+            for rank, p in enumerate(r.get("attractions") or [], start=1)
+        ],
+    }
+
+
+class ParquetExportWriter:
+    """Stream results into the three Parquet tables under the `out_dir` directory."""
+
+    def __init__(self, out_dir, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        if pa is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        os.makedirs(out_dir, exist_ok=True)
+        self.row_group_size = row_group_size
+        self.schemas = _schemas()
+        self.writers = {
+            name: pq.ParquetWriter(os.path.join(out_dir, f"{name}.parquet"), schema, compression=PARQUET_COMPRESSION)
+            for name, schema in self.schemas.items()
+        }
+        self.buffers = {name: [] for name in self.schemas}
+        self.count = 0
+        self.closed = False
+
+    def _write_rows(self, name, rows):
+        if rows:
+            table = pa.Table.from_pylist(rows, schema=self.schemas[name])
+            self.writers[name].write_table(table, row_group_size=self.row_group_size)
+
+    def write(self, result):
+        self.count += 1
+        for name, rows in split_result(self.count, result).items():
+            buffer = self.buffers[name]
+            buffer.extend(rows)
+            # write full row groups only; the remainder waits for more rows
+            while len(buffer) >= self.row_group_size:
+                self._write_rows(name, buffer[:self.row_group_size])
+                del buffer[:self.row_group_size]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for name, writer in self.writers.items():
+            self._write_rows(name, self.buffers[name])
+            self.buffers[name] = []
+            writer.close()
+
+
+def parquet_zip_bytes(results):
+    """Return a zip archive (bytes) of the three Parquet tables, for downloads."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    schemas = _schemas()
+    rows = {name: [] for name in schemas}
+    for city_id, r in enumerate(results, start=1):
+        for name, table_rows in split_result(city_id, r).items():
+            rows[name].extend(table_rows)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, schema in schemas.items():
+            buf = io.BytesIO()
+            pq.write_table(pa.Table.from_pylist(rows[name], schema=schema), buf, compression=PARQUET_COMPRESSION)
+            zf.writestr(f"{name}.parquet", buf.getvalue())
+    return archive.getvalue()
@@ -1,11 +1,153 @@
+"""
+Itinerary parsing: free-text "City: <name> <date>" lines and bulk itinerary
+files (main.py --input FILE).
+
+iter_trip_file reads CSV, JSONL or plain-text files one line at a time and
+yields planner tokens ("City", "City:YYYY-MM-DD" or "City:YYYY-MM-DD:YYYY-MM-DD"),
+so files of any size stream straight into the planner in constant memory.
+"""
+
+import csv
+import json
+import os
+import re
+
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# "City: New York 2026-03-10" (the date is optional)
+ITINERARY_LINE_RE = re.compile(r"^\s*City\s*:\s*(?P<city>.+?)(?:\s+(?P<date>\d{4}-\d{2}-\d{2}))?\s*$")
+
+
+def parse_itinerary_line(line):
+    """Return {"city", "date"} for a "City: <name> [date]" line, or None."""
+    match = ITINERARY_LINE_RE.match(line)
+    if not match:
+        return None
+    return {"city": match.group("city"), "date": match.group("date")}
+
+
 def parse_trip_input(text):
-    lines = text.split("\n")
     cities = []
+    for line in text.splitlines():
+        entry = parse_itinerary_line(line)
+        if entry is not None:
+            cities.append(entry)
+    return cities
 
-    for line in lines:
-        if "City" in line:
-            parts = line.split(":")[1].strip()
-            city, date = parts.split(" ")
-            cities.append({"city": city, "date": date})
 
-    return cities
+def city_token(city, start=None, end=None):
+    """Build a planner token; dates that are not YYYY-MM-DD are ignored."""
+    city = " ".join(str(city).split())
+    if not city:
+        return None
+    start = start.strip() if isinstance(start, str) else None
+    end = end.strip() if isinstance(end, str) else None
+    if not (start and DATE_RE.match(start)):
+        return city
+    if end and DATE_RE.match(end) and end != start:
+        return f"{city}:{start}:{end}"
+    return f"{city}:{start}"
+
+
+def line_token(line):
+    """A plain-text line: a "City: <name> [date]" itinerary line or a planner token."""
+    entry = parse_itinerary_line(line)
+    if entry is not None:
+        return city_token(entry["city"], entry["date"])
+    return city_token(line) if ":" not in line else line.strip()
+
+
+# CSV header cells (case-insensitive) -> column; a row containing any of
+# these and no date is a header, never a city
+CSV_COLUMNS = {
+    "city": "city", "destination": "city", "name": "city", "place": "city", "location": "city",
+    "start": "start", "date": "start", "start_date": "start", "from": "start", "arrival": "start",
+    "end": "end", "end_date": "end", "to": "end", "departure": "end",
+}
+
+
+def csv_header(row):
+    """Column names for a header row (the city column is the first not named start/end), or None."""
+    cells = [" ".join(cell.split()).lower().replace(" ", "_") for cell in row]
+    if not any(cell in CSV_COLUMNS for cell in cells) or any(DATE_RE.match(cell) for cell in cells):
+        return None
+    columns = [CSV_COLUMNS.get(cell, cell) for cell in cells]
+    if "city" not in columns:
+        columns[next((i for i, c in enumerate(columns) if c not in ("start", "end")), 0)] = "city"
+    return columns
+
+
+def _iter_csv(f, on_error):
+    """Rows of city[,start[,end]], optionally under a header row (see CSV_COLUMNS)."""
+    rows = csv.reader(f)
+    columns = None
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            on_error(rows.line_num, e)
+            continue
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            columns = csv_header(row)
+            if columns is not None:
+                continue
+            columns = ["city", "start", "end"]
+        record = dict(zip(columns, row))
+        yield city_token(record.get("city", ""), record.get("start"), record.get("end"))
+
+
+def _iter_jsonl(f, on_error):
+    """Lines holding {"city", "start"|"date", "end"} objects or plain token strings."""
+    for lineno, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            on_error(lineno, e)
+            continue
+        if isinstance(record, str):
+            yield line_token(record)
+        elif isinstance(record, dict):
+            yield city_token(record.get("city", ""), record.get("start") or record.get("date"), record.get("end"))
+        else:
+            on_error(lineno, f"expected an object or a string, got {type(record).__name__}")
+
+
+def _iter_text(f, on_error):
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line_token(line)
+
+
+READERS = {"csv": _iter_csv, "jsonl": _iter_jsonl, "text": _iter_text}
+EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def iter_trip_file(path, fmt=None):
+    """Lazily yield planner tokens from an itinerary file.
+
+    `fmt` is "csv", "jsonl" or "text"; by default it follows the file
+    extension (.csv, .jsonl/.ndjson, anything else is text). Lines that
+    cannot be parsed are reported with their line number and skipped, so
+    one bad line never stops a long run.
+    """
+    fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower(), "text")
+    skipped = 0
+
+    def on_error(lineno, error):
+        nonlocal skipped
+        skipped += 1
+        print(f"Skipping {path}:{lineno}: {error}")
+
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as f:
+        for token in READERS[fmt](f, on_error):
+            if token:
+                yield token
+    if skipped:
+        print(f"Skipped {skipped} malformed line(s) in {path}")
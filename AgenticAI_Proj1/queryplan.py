@@ -0,0 +1,88 @@
+"""
+Cross-itinerary query planning for bulk planner runs.
+
+In a large itinerary the same city shows up under many date ranges and
+spellings ("new york", "New York ", "NYC"). A QueryPlan sits between the
+planner and the fetchers for one run:
+
+- each normalized city name is geocoded once;
+- names that land on the same place (within LOCATION_CACHE_GRID_KM of a
+  place already fetched, found with a vectorized distance pass over all
+  known places) share one attractions/forecast/AQI fetch;
+- the place data is fanned back out to every token.
+
+Lookups resolve as tokens stream in. The name and place tables are LRU
+bounded (QUERY_PLAN_CACHE_SIZE) and places keep only the fields the planner
+reports (not the raw weather payload), so --input runs stay flat; a place
+evicted from the table is simply fetched again.
+"""
+
+from cache import normalize_address
+from config import LOCATION_CACHE_GRID_KM, QUERY_PLAN_CACHE_SIZE
+from geo import PointIndex
+from runmemo import RunMemo, AsyncRunMemo
+import async_tools
+from tools import geocode_location, fetch_place_data
+
+
+class QueryPlan:
+    """Per-run tables that fetch each unique city name and place once."""
+
+    def __init__(self, radius_km=2, merge_km=LOCATION_CACHE_GRID_KM, maxsize=QUERY_PLAN_CACHE_SIZE):
+        self.radius_km = radius_km
+        self.merge_km = merge_km
+        # coordinates only (16 bytes per unique place); results live in the bounded tables
+        self.known_places = PointIndex()
+        self.names = RunMemo(maxsize)
+        self.places = RunMemo(maxsize)
+        self.async_names = AsyncRunMemo(maxsize)
+        self.async_places = AsyncRunMemo(maxsize)
+
+    def place_key(self, geo):
+        """Id of the first place within merge_km of these coordinates (unlike grid
+        cells, two points a few metres apart always merge)."""
+        return self.known_places.add_or_match(geo["lat"], geo["lng"], self.merge_km)
+
+    @staticmethod
+    def _slim(place):
+        """Keep what build_city_result uses; the raw weather payload is dropped."""
+        return {"attractions": place["attractions"], "daily": place["daily"], "aqi": place["aqi"], "weather": None}
+
+    @staticmethod
+    def _city_data(geo, place):
+        return {"lat": geo["lat"], "lng": geo["lng"], "address": geo.get("address", ""), **place}
+
+    def fetch(self, city):
+        """Same result as tools.fetch_city_bundle(city), shared across equivalent tokens."""
+        geo = self.names.call(normalize_address(city), lambda: geocode_location(city))
+        place = self.places.call(
+            self.place_key(geo),
+            lambda: self._slim(fetch_place_data(city, geo["lat"], geo["lng"], self.radius_km)),
+        )
+        return self._city_data(geo, place)
+
+    async def afetch(self, city):
+        """Async counterpart of fetch built on async_tools."""
+        geo = await self.async_names.call(normalize_address(city), lambda: async_tools.geocode_location(city))
+        place = await self.async_places.call(
+            self.place_key(geo),
+            lambda: self._afetch_place(city, geo),
+        )
+        return self._city_data(geo, place)
+
+    async def _afetch_place(self, city, geo):
+        return self._slim(await async_tools.fetch_place_data(city, geo["lat"], geo["lng"], self.radius_km))
+
+    def stats(self):
+        lookups = self.names.hits + self.names.misses + self.async_names.hits + self.async_names.misses
+        names = self.names.misses + self.async_names.misses
+        # only tokens that geocoded reach the place table
+        place_lookups = self.places.hits + self.places.misses + self.async_places.hits + self.async_places.misses
+        places = self.places.misses + self.async_places.misses
+        return {
+            "tokens": lookups,
+            "unique_names": names,
+            "unique_places": places,
+            "geocodes_saved": lookups - names,
+            "place_fetches_saved": place_lookups - places,
+        }
@@ -0,0 +1,155 @@
+"""
+Per-provider rate limiting shared by every outbound call.
+
+Each provider (Google Geocoding, Places, Weather, Air Quality, OpenWeatherMap,
+OpenAI) gets an adaptive token bucket. Callers reserve a token before each
+request. A 429 halves the bucket's rate and pauses it for the Retry-After
+period, and each successful request adds back a little of the configured
+rate (AIMD), so concurrent batches settle near the highest rate the quota
+allows.
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from config import RATE_LIMITS
+
+# (host, path prefix) -> provider name; first match wins
+PROVIDER_ROUTES = (
+    ("maps.googleapis.com", "/maps/api/geocode", "google_geocoding"),
+    ("maps.googleapis.com", "/maps/api/place", "google_places"),
+    ("weather.googleapis.com", "", "google_weather"),
+    ("airquality.googleapis.com", "", "google_air_quality"),
+    ("api.openweathermap.org", "", "openweathermap"),
+    ("api.openai.com", "", "openai"),
+)
+
+
+class AdaptiveTokenBucket:
+    """Token bucket whose refill rate adapts to throttling (requests/second)."""
+
+    def __init__(self, name, rate, burst=None, min_rate=None, increase=0.05):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else max(rate / 16, 0.05)
+        self.increase = increase
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    @property
+    def enabled(self):
+        return self.max_rate > 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _reserve(self):
+        """Take one token (possibly going into debt) and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(self.blocked_until - now, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+            self.acquired += 1
+            self.waited += wait
+            return wait
+
+    def try_acquire(self):
+        if not self.enabled:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until or self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.acquired += 1
+            return True
+
+    def acquire(self):
+        if not self.enabled:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        if not self.enabled:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_throttle(self, retry_after=None):
+        """Halve the rate and pause the bucket after a 429."""
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
+            self.throttled += 1
+
+    def on_success(self):
+        """Creep back toward the configured rate after a successful request."""
+        if not self.enabled or self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.increase)
+
+    def stats(self):
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "acquired": self.acquired,
+            "throttled": self.throttled,
+            "waited_s": round(self.waited, 3),
+        }
+
+
+buckets = {name: AdaptiveTokenBucket(name, rate) for name, rate in RATE_LIMITS.items()}
+
+
+def provider_for(url):
+    parts = urlsplit(url)
+    for host, prefix, name in PROVIDER_ROUTES:
+        if parts.hostname == host and parts.path.startswith(prefix):
+            return name
+    return None
+
+
+def bucket_for(url):
+    """Return the bucket for a request URL, or None for hosts we do not limit."""
+    return buckets.get(provider_for(url))
+
+
+def parse_retry_after(value):
+    """Return Retry-After in seconds (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def rate_limit_stats():
+    return {name: b.stats() for name, b in buckets.items()}
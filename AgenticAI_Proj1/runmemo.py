@@ -0,0 +1,141 @@
+"""
+Per-run memo table for agent tool calls.
+
+Inside `with run_memo():` (one agent conversation), a tool called again with
+the same arguments gets the earlier result instead of going back to the
+network, including when the model repeats a call after a parsing mistake.
+Identical calls issued in the same turn wait for the first one. The table
+lives in a context variable, which LangGraph copies into its tool threads,
+and is discarded when the block exits.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from cache import normalize_address
+
+_current = contextvars.ContextVar("tool_run_memo", default=None)
+
+
+def normalize_value(value, digits=4):
+    """Round floats (4 digits is ~11 m of latitude) and case-fold strings."""
+    if isinstance(value, float):
+        return round(value, digits)
+    if isinstance(value, str):
+        return normalize_address(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(v, digits) for v in value)
+    if isinstance(value, dict):
+        return normalize_args(value, digits)
+    return value
+
+
+def normalize_args(kwargs, digits=4):
+    return tuple(sorted((k, normalize_value(v, digits)) for k, v in kwargs.items()))
+
+
+def _evict(table, maxsize):
+    """Drop least recently used entries beyond `maxsize` (None: unbounded)."""
+    while maxsize is not None and len(table) > maxsize:
+        table.popitem(last=False)
+
+
+class RunMemo:
+    """Results of the tool calls made during one run, keyed on (tool, normalized args).
+
+    With `maxsize`, only that many recently used results are kept; an evicted
+    key is simply computed again.
+    """
+
+    def __init__(self, maxsize=None):
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, key, fn):
+        with self._lock:
+            future = self._results.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._results[key] = future
+                self.misses += 1
+                _evict(self._results, self.maxsize)
+            else:
+                self._results.move_to_end(key)
+                self.hits += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            # failures are not remembered; a later identical call tries again
+            with self._lock:
+                if self._results.get(key) is future:
+                    del self._results[key]
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class AsyncRunMemo:
+    """asyncio counterpart of RunMemo; `fn` is a coroutine function."""
+
+    def __init__(self, maxsize=None):
+        self._tasks = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    async def call(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._forget_failed, key))
+            self.misses += 1
+            _evict(self._tasks, self.maxsize)
+        else:
+            self._tasks.move_to_end(key)
+            self.hits += 1
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _forget_failed(self, key, task):
+        if (task.cancelled() or task.exception() is not None) and self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+@contextlib.contextmanager
+def run_memo():
+    """Scope a fresh memo table to the enclosed agent run."""
+    memo = RunMemo()
+    token = _current.set(memo)
+    try:
+        yield memo
+    finally:
+        _current.reset(token)
+
+
+def memoized_call(tool_name, kwargs, fn):
+    """Call fn() through the current run's memo (directly when no run is active)."""
+    memo = _current.get()
+    if memo is None:
+        return fn()
+    return memo.call((tool_name, normalize_args(kwargs)), fn)
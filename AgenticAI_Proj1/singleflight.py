@@ -0,0 +1,124 @@
+"""
+Request coalescing ("single flight") for the tools.py fetchers.
+
+When several threads or tasks ask for the same key at the same time, only the
+first one calls the provider; the others wait for that call and receive the
+same result, or the same exception. Nothing is remembered once the call
+finishes; caching is handled separately in cache.py.
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+
+
+def default_key(*args, **kwargs):
+    return args, tuple(sorted(kwargs.items()))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based coalescing of concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.calls += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight; callers await one shared task."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = loop.create_task(fn(*args, **kwargs))
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        # shield: one caller being cancelled must not cancel the shared call
+        return await asyncio.shield(task)
+
+
+_groups = {}
+
+
+def coalesced(key_fn=default_key):
+    """Decorator that routes calls through a per-function single-flight group.
+
+    `key_fn` receives the call arguments and returns the hashable key that
+    identifies identical requests. Works for functions and coroutines.
+    """
+
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        if inspect.iscoroutinefunction(fn):
+            group = AsyncSingleFlight()
+            _groups[name] = group
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await group.do(key_fn(*args, **kwargs), fn, *args, **kwargs)
+
+            return async_wrapper
+
+        group = SingleFlight()
+        _groups[name] = group
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(key_fn(*args, **kwargs), fn, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def singleflight_stats():
+    """Return how many calls went out and how many were coalesced, per function."""
+    return {name: {"calls": g.calls, "coalesced": g.coalesced} for name, g in _groups.items()}
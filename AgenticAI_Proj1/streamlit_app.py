@@ -2,8 +2,9 @@ import streamlit as st
 import json
 import io
 import csv
-from tools import geocode_location, get_owm_forecast, get_owm_air_quality
+from tools import geocode_location, validate_google_key, get_owm_forecast, get_owm_air_quality
 from main import run_trip_planner, export_json, export_csv
+from parquet_export import parquet_zip_bytes
 from config import OPENWEATHER_API_KEY
 
 st.set_page_config(page_title="Concise Travel Planner", layout="wide", page_icon="🧳")
@@ -66,6 +67,52 @@ if OPENWEATHER_API_KEY:
 else:
     st.info("OpenWeatherMap: Disabled (falls back to Google where available). Add OPENWEATHER_API_KEY to .env to enable")
 
+def render_city_card(r):
+    """Render one planned city as a card."""
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.markdown(f"<div class='section-header'>🌆 {r.get('city')}</div>", unsafe_allow_html=True)
+    addr = r.get("address")
+    if addr:
+        st.write(f"📍 **Address:** {addr}")
+    st.markdown("<hr>", unsafe_allow_html=True)
+
+    st.markdown("<div class='section-header'>🏛️ Top nearby spots (≤2 km):</div>", unsafe_allow_html=True)
+    attractions = r.get("attractions", [])
+    if attractions:
+        df_rows = []
+        for p in attractions:
+            df_rows.append({
+                "Name": p.get("name"),
+                "Address": p.get("address", ""),
+                "Distance (km)": p.get("distance_km"),
+                "Type": p.get("type"),
+            })
+        st.table(df_rows)
+    else:
+        st.write("No attractions found within 2 km.")
+
+    st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown("<div class='section-header'>🌦️ Weather (by day):</div>", unsafe_allow_html=True)
+    daily = r.get("daily", [])
+    if daily and any(d.get('high') is not None for d in daily):
+        for i, d in enumerate(daily):
+            st.write(f"Day {i+1}: {d.get('high', 'N/A')} / {d.get('low', 'N/A')} °C, {d.get('precip', 0)}% precip")
+    else:
+        st.write("N/A (weather data unavailable)")
+
+    st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown(f"<div class='section-header'>🧥 Best wear:</div>", unsafe_allow_html=True)
+    st.write(f"{r.get('clothing')}")
+    st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown(f"<div class='section-header'>😷 AQI:</div>", unsafe_allow_html=True)
+    st.write(f"{r.get('aqi')}")
+    st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown(f"<div class='section-header'>📝 Quick notes:</div>", unsafe_allow_html=True)
+    for n in r.get("notes", []) or []:
+        st.write(f"- {n}")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
 cities_input = st.text_input("Cities", value="Tokyo")
 mock = st.checkbox("Mock mode (no API calls)")
 
@@ -82,7 +129,7 @@ if validate:
         st.info("Mock mode: key validation skipped.")
     else:
         try:
-            geo = geocode_location("Paris")
+            geo = validate_google_key("Paris")
             st.success("Google API key appears valid. Example geocode: {}".format(geo.get("address")))
         except Exception as e:
             st.error(f"Google API key validation failed: {e}")
@@ -110,60 +157,24 @@ if run:
     elif not mock:
         st.info("Using Google (or fallback) for weather & AQI")
 
+    # Cards are drawn as each city finishes instead of after the whole batch
+    progress = st.empty()
+
+    def show_city(r):
+        render_city_card(r)
+        progress.caption(f"Planned {r.get('city')}")
+
     with st.spinner("Planning trip..."):
         try:
-            results = run_trip_planner(tokens, mock=mock)
+            results = run_trip_planner(tokens, mock=mock, on_result=show_city)
         except Exception as e:
             st.error(f"Planner failed: {e}")
             results = []
+    progress.empty()
 
     if not results:
         st.warning("No results returned. Check inputs or enable mock mode for a demo.")
     else:
-        for r in results:
-            st.markdown("<div class='card'>", unsafe_allow_html=True)
-            st.markdown(f"<div class='section-header'>🌆 {r.get('city')}</div>", unsafe_allow_html=True)
-            addr = r.get("address")
-            if addr:
-                st.write(f"📍 **Address:** {addr}")
-            st.markdown("<hr>", unsafe_allow_html=True)
-
-            st.markdown("<div class='section-header'>🏛️ Top nearby spots (≤2 km):</div>", unsafe_allow_html=True)
-            attractions = r.get("attractions", [])
-            if attractions:
-                df_rows = []
-                for p in attractions:
-                    df_rows.append({
-                        "Name": p.get("name"),
-                        "Address": p.get("address", ""),
-                        "Distance (km)": p.get("distance_km"),
-                        "Type": p.get("type"),
-                    })
-                st.table(df_rows)
-            else:
-                st.write("No attractions found within 2 km.")
-
-            st.markdown("<hr>", unsafe_allow_html=True)
-            st.markdown("<div class='section-header'>🌦️ Weather (by day):</div>", unsafe_allow_html=True)
-            daily = r.get("daily", [])
-            if daily and any(d.get('high') is not None for d in daily):
-                for i, d in enumerate(daily):
-                    st.write(f"Day {i+1}: {d.get('high', 'N/A')} / {d.get('low', 'N/A')} °C, {d.get('precip', 0)}% precip")
-            else:
-                st.write("N/A (weather data unavailable)")
-
-            st.markdown("<hr>", unsafe_allow_html=True)
-            st.markdown(f"<div class='section-header'>🧥 Best wear:</div>", unsafe_allow_html=True)
-            st.write(f"{r.get('clothing')}")
-            st.markdown("<hr>", unsafe_allow_html=True)
-            st.markdown(f"<div class='section-header'>😷 AQI:</div>", unsafe_allow_html=True)
-            st.write(f"{r.get('aqi')}")
-            st.markdown("<hr>", unsafe_allow_html=True)
-            st.markdown(f"<div class='section-header'>📝 Quick notes:</div>", unsafe_allow_html=True)
-            for n in r.get("notes", []) or []:
-                st.write(f"- {n}")
-            st.markdown("</div>", unsafe_allow_html=True)
-
         # Downloads
         st.markdown("---")
         st.markdown("### Export results")
@@ -186,4 +197,10 @@ if run:
             ])
         st.download_button("Download CSV", data=csv_io.getvalue(), file_name="planner_output.csv", mime="text/csv")
 
+        # Parquet: cities, daily and attractions tables linked by city_id
+        try:
+            st.download_button("Download Parquet (zip)", data=parquet_zip_bytes(results), file_name="planner_output_parquet.zip", mime="application/zip")
+        except RuntimeError as e:
+            st.info(str(e))
+
     st.success("Done")
@@ -0,0 +1,59 @@
+"""In-memory TTL/LRU caches (cache.TTLCache, location_cached)."""
+
+import cache
+from cache import TTLCache, location_cached
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = TTLCache("test_expiry", maxsize=10, ttl=60)
+    c.set("a", 1)
+    clock.now += 59
+    assert c.get("a") == (True, 1)
+    clock.now += 2
+    assert c.get("a") == (False, None)
+    assert c.stats() == {"size": 0, "hits": 1, "misses": 1, "evictions": 0, "expirations": 1}
+
+
+def test_lru_eviction_counts():
+    c = TTLCache("test_eviction", maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == (True, 1)  # "b" is now least recently used
+    c.set("c", 3)
+    assert c.get("b") == (False, None)
+    assert c.get("a") == (True, 1) and c.get("c") == (True, 3)
+    stats = c.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_disabled_cache_stores_nothing():
+    c = TTLCache("test_disabled", maxsize=10, ttl=0)
+    c.set("a", 1)
+    assert c.get("a") == (False, None)
+
+
+def test_location_cached_snaps_to_grid_and_skips_empty_results():
+    c = TTLCache("test_location", maxsize=10, ttl=60)
+    calls = []
+
+    @location_cached(c, grid_km=1.0)
+    def fetch(lat, lng):
+        calls.append((lat, lng))
+        return {} if lat < 0 else {"aqi": 40}
+
+    assert fetch(48.8500, 2.3500) == {"aqi": 40}
+    assert fetch(48.8501, 2.3501) == {"aqi": 40}  # same grid cell
+    assert len(calls) == 1
+    fetch(-10.0, 0.0)
+    fetch(-10.0, 0.0)  # empty results are not cached
+    assert len(calls) == 3
@@ -0,0 +1,92 @@
+"""Vectorized distance ranking (geo.py, tools.rank_attractions) against the scalar loop."""
+
+import random
+
+import numpy as np
+
+import geo
+from tools import haversine, rank_attractions
+
+
+def scalar_rank(data, lat, lng, radius_km, max_results):
+    """The original per-place loop: haversine, round, filter by radius, stable sort."""
+    places = []
+    for r in data.get("results", []):
+        loc = r.get("geometry", {}).get("location")
+        if not loc:
+            continue
+        place_type = r.get("types", [])
+        places.append({
+            "name": r.get("name"),
+            "address": r.get("formatted_address") or r.get("vicinity") or "",
+            "lat": loc.get("lat"),
+            "lng": loc.get("lng"),
+            "distance_km": round(haversine(lat, lng, loc.get("lat"), loc.get("lng")), 2),
+            "type": place_type[0] if place_type else "attraction",
+        })
+    filtered = sorted((p for p in places if p["distance_km"] <= radius_km), key=lambda p: p["distance_km"])
+    if not filtered:
+        return sorted(places, key=lambda p: p["distance_km"])[:max_results]
+    return filtered[:max_results]
+
+
+def places_reply(rng, n, spread):
+    return {"results": [
+        {
+            "name": f"place {i}",
+            "geometry": {"location": {"lat": 48.85 + rng.uniform(-spread, spread), "lng": 2.35 + rng.uniform(-spread, spread)}},
+            "types": ["museum"] if i % 2 else [],
+            "formatted_address": f"{i} Rue",
+        }
+        for i in range(n)
+    ]}
+
+
+def test_rank_attractions_matches_scalar_loop():
+    rng = random.Random(7)
+    for _ in range(300):
+        data = places_reply(rng, rng.choice([0, 1, 3, 5, 8, 50, 400]), rng.choice([0.001, 0.01, 0.05, 0.5]))
+        for radius_km, max_results in [(2, 5), (0.5, 3), (10, 20)]:
+            assert rank_attractions(data, 48.85, 2.35, radius_km, max_results) == scalar_rank(data, 48.85, 2.35, radius_km, max_results)
+
+
+def test_rank_attractions_skips_results_without_coordinates():
+    data = {"results": [
+        {"name": "no lng", "geometry": {"location": {"lat": 48.86}}},
+        {"name": "null location", "geometry": {"location": None}},
+        {"name": "no geometry"},
+        {"name": "ok", "geometry": {"location": {"lat": 48.86, "lng": 2.34}}},
+    ]}
+    assert [p["name"] for p in rank_attractions(data, 48.85, 2.35)] == ["ok"]
+
+
+def test_haversine_many_and_matrix_match_scalar():
+    lats, lngs = [48.85, 40.71, 35.68], [2.35, -74.0, 139.69]
+    expected = [haversine(48.85, 2.35, a, b) for a, b in zip(lats, lngs)]
+    assert np.allclose(geo.haversine_many(48.85, 2.35, lats, lngs), expected)
+    matrix = geo.haversine_matrix(lats, lngs, lats, lngs)
+    assert matrix.shape == (3, 3)
+    assert np.allclose(matrix, matrix.T) and np.allclose(np.diag(matrix), 0)
+    assert np.allclose(matrix[0], expected)
+
+
+def test_nearest_keeps_input_order_for_ties():
+    assert geo.nearest([3, 1, 1, 2, 1], 2).tolist() == [1, 2]
+    assert geo.nearest([1, 1, 1, 1], 3).tolist() == [0, 1, 2]
+
+
+def test_nearest_radius():
+    assert geo.nearest([3, 1, 1, 2, 1], 10, within=2).tolist() == [1, 2, 4, 3]
+    assert geo.nearest([3, 1, 1, 2, 1], 2, within=1).tolist() == [1, 2]
+    assert geo.nearest([5, 6], 3, within=2).tolist() == []
+    assert geo.nearest([], 3).tolist() == []
+    assert geo.nearest([1, 2], 0).tolist() == []
+
+
+def test_point_index_merges_nearby_points():
+    index = geo.PointIndex(capacity=1)
+    assert index.add_or_match(48.85, 2.35, 1.0) == 0
+    assert index.add_or_match(48.851, 2.351, 1.0) == 0  # ~130 m away
+    assert index.add_or_match(45.75, 4.85, 1.0) == 1
+    assert index.add_or_match(45.7501, 4.8501, 1.0) == 1
+    assert len(index) == 2
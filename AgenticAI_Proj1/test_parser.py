@@ -0,0 +1,45 @@
+"""Itinerary file readers (parser.py)."""
+
+import parser as trip_parser
+from parser import csv_header, iter_trip_file
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_csv_header_detection():
+    assert csv_header(["city", "start", "end"]) == ["city", "start", "end"]
+    assert csv_header(["Destination", "Start", "End"]) == ["city", "start", "end"]
+    assert csv_header(["Name", "Date"]) == ["city", "start"]
+    assert csv_header(["trip", "start", "end"]) == ["city", "start", "end"]
+    assert csv_header(["Paris", "2026-03-01"]) is None
+    assert csv_header(["Tokyo"]) is None
+    # a row with a date is data even if a cell looks like a column name
+    assert csv_header(["Name", "2026-03-01"]) is None
+
+
+def test_csv_rows_with_and_without_header(tmp_path):
+    with_header = write(tmp_path, "a.csv", "destination,start,end\nParis,2026-03-01,2026-03-03\nTokyo\n")
+    assert list(iter_trip_file(with_header)) == ["Paris:2026-03-01:2026-03-03", "Tokyo"]
+    no_header = write(tmp_path, "b.csv", "Paris,2026-03-01\nNew  York\n\n")
+    assert list(iter_trip_file(no_header)) == ["Paris:2026-03-01", "New York"]
+
+
+def test_malformed_lines_are_skipped(tmp_path, capsys):
+    jsonl = write(tmp_path, "c.jsonl", '{"city": "Paris"}\n{bad\n"Tokyo:2026-01-01"\n42\n{"city": "Lyon", "date": "2026-02-02"}\n')
+    assert list(iter_trip_file(jsonl)) == ["Paris", "Tokyo:2026-01-01", "Lyon:2026-02-02"]
+    out = capsys.readouterr().out
+    assert "c.jsonl:2" in out and "c.jsonl:4" in out and "Skipped 2 malformed" in out
+
+    big = "X" * 200000
+    csv_path = write(tmp_path, "d.csv", f"city,start\nParis,2026-01-01\n{big},2026-01-01\nTokyo,2026-01-02\n")
+    assert list(iter_trip_file(csv_path)) == ["Paris:2026-01-01", "Tokyo:2026-01-02"]
+
+
+def test_text_lines(tmp_path):
+    text = write(tmp_path, "e.txt", "# trip\nCity: New York 2026-03-10\nParis:2026-01-01:2026-01-03\nLyon\n")
+    assert list(iter_trip_file(text)) == ["New York:2026-03-10", "Paris:2026-01-01:2026-01-03", "Lyon"]
+    assert trip_parser.parse_trip_input("City: São Paulo\nnoise") == [{"city": "São Paulo", "date": None}]
@@ -0,0 +1,83 @@
+"""Request coalescing (singleflight.py): shared results and shared errors."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, AsyncSingleFlight
+
+
+def run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_concurrent_callers_share_one_call():
+    group = SingleFlight()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+
+    run_concurrently(5, lambda: results.append(group.do("key", fetch)))
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert (group.calls, group.coalesced) == (1, 4)
+
+
+def test_concurrent_callers_share_the_error():
+    group = SingleFlight()
+    calls = []
+    errors = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ConnectionError("provider down")
+
+    def caller():
+        try:
+            group.do("key", fetch)
+        except ConnectionError as e:
+            errors.append(e)
+
+    run_concurrently(4, caller)
+    assert len(calls) == 1
+    assert len(errors) == 4 and all(e is errors[0] for e in errors)
+
+
+def test_failures_are_not_remembered():
+    group = SingleFlight()
+    with pytest.raises(ValueError):
+        group.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+    assert group.do("key", lambda: "recovered") == "recovered"
+
+
+def test_async_callers_share_result_and_error():
+    group = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(fail):
+        calls.append(fail)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise ConnectionError("provider down")
+        return "value"
+
+    async def main():
+        ok = await asyncio.gather(*(group.do("ok", fetch, False) for _ in range(3)))
+        failed = await asyncio.gather(*(group.do("bad", fetch, True) for _ in range(3)), return_exceptions=True)
+        return ok, failed
+
+    ok, failed = asyncio.run(main())
+    assert ok == ["value"] * 3
+    assert all(isinstance(e, ConnectionError) for e in failed)
+    assert calls == [False, True]
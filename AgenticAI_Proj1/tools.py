@@ -18,23 +18,72 @@ def aqi_category(aqi):
         return "Very Unhealthy"
     else:
         return "Hazardous"
-import requests
 import math
-from config import GOOGLE_MAPS_API_KEY, OPENWEATHER_API_KEY
-
-
-def geocode_location(address):
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {"address": address, "key": GOOGLE_MAPS_API_KEY}
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        raise ValueError(f"Geocoding request failed (status code {response.status_code})")
-    data = response.json()
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import (
+    GOOGLE_MAPS_API_KEY,
+    OPENWEATHER_API_KEY,
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_TTL,
+    GEOCODE_NEGATIVE_TTL,
+    LOCATION_CACHE_GRID_KM,
+    LOCATION_CACHE_SIZE,
+    FORECAST_CACHE_TTL,
+    WEATHER_CACHE_TTL,
+    AIR_QUALITY_CACHE_TTL,
+    HEDGE_DELAY,
+    REQUEST_SHAPE_PATH,
+    REQUEST_SHAPE_RECHECK,
+)
+import http_client
+from cache import GeocodeCache, RequestShapeMemory, TTLCache, location_cached, location_key, normalize_address
+from singleflight import coalesced
+from gazetteer import offline_geocode
+from geo import haversine_many, nearest
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+WEATHER_URL = "https://weather.googleapis.com/v1/currentConditions:lookup"
+AIR_QUALITY_URL = "https://airquality.googleapis.com/v1/currentConditions:lookup"
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+OWM_FORECAST_URL = "https://api.openweathermap.org/data/2.5/onecall"
+OWM_AIR_QUALITY_URL = "http://api.openweathermap.org/data/2.5/air_pollution"
+
+geocode_cache = GeocodeCache(GEOCODE_CACHE_PATH, GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_TTL)
+request_shapes = RequestShapeMemory(REQUEST_SHAPE_PATH, REQUEST_SHAPE_RECHECK)
+
+# In-process caches shared by the sync and async fetchers. Forecasts change
+# slowly, current air quality does not, hence the different TTLs.
+weather_cache = TTLCache("google_weather", LOCATION_CACHE_SIZE, WEATHER_CACHE_TTL)
+air_quality_cache = TTLCache("google_air_quality", LOCATION_CACHE_SIZE, AIR_QUALITY_CACHE_TTL)
+owm_forecast_cache = TTLCache("owm_forecast", LOCATION_CACHE_SIZE, FORECAST_CACHE_TTL)
+owm_air_quality_cache = TTLCache("owm_air_quality", LOCATION_CACHE_SIZE, AIR_QUALITY_CACHE_TTL)
+
+
+class GeocodeNotFound(ValueError):
+    """Geocoding succeeded but returned no match for the address."""
+
+
+# Keys whose presence means a Google Weather reply carries usable data
+WEATHER_FIELDS = ("dailyForecasts", "daily", "temperature", "currentConditions")
+
+
+# Request builders and response parsers are shared with async_tools.py so the
+# sync and async fetchers behave identically.
+def geocode_params(address):
+    return {"address": address, "key": GOOGLE_MAPS_API_KEY}
+
+
+def parse_geocode(status_code, data, address):
+    if status_code != 200:
+        raise ValueError(f"Geocoding request failed (status code {status_code})")
 
     status = data.get("status")
     if status != "OK" or not data.get("results"):
         err_msg = data.get("error_message") or "No results"
-        raise ValueError(f"No geocoding results for '{address}' (status: {status}) - {err_msg}")
+        # Only a genuine "no match" is safe to cache; key/quota errors are not.
+        error_cls = GeocodeNotFound if status in ("OK", "ZERO_RESULTS") else ValueError
+        raise error_cls(f"No geocoding results for '{address}' (status: {status}) - {err_msg}")
 
     location = data["results"][0]["geometry"]["location"]
     formatted_address = data["results"][0].get("formatted_address", address)
@@ -42,37 +91,125 @@ def geocode_location(address):
     return {"lat": location["lat"], "lng": location["lng"], "address": formatted_address}
 
 
-def get_weather(lat, lng):
-    url = "https://weather.googleapis.com/v1/currentConditions:lookup"
-    params = {
+def weather_get_params(lat, lng):
+    return {
         "key": GOOGLE_MAPS_API_KEY,
         "location.latitude": lat,
         "location.longitude": lng
     }
+
+
+def location_body(lat, lng):
+    return {"location": {"latitude": lat, "longitude": lng}}
+
+
+def has_weather_fields(data):
+    return any(k in data for k in WEATHER_FIELDS)
+
+
+def places_params(city):
+    return {"query": f"tourist attractions in {city}", "key": GOOGLE_MAPS_API_KEY}
+
+
+def owm_forecast_params(lat, lng):
+    return {"lat": lat, "lon": lng, "exclude": "current,minutely,hourly,alerts", "units": "metric", "appid": OPENWEATHER_API_KEY}
+
+
+def owm_air_quality_params(lat, lng):
+    return {"lat": lat, "lon": lng, "appid": OPENWEATHER_API_KEY}
+
+
+def validate_google_key(address="Paris"):
+    """Geocode `address` straight through the Geocoding API to check the key.
+
+    Skips the gazetteer and the geocode cache, which would answer without
+    ever sending the key to Google.
+    """
+    response = http_client.get(GEOCODE_URL, params=geocode_params(address))
+    return parse_geocode(response.status_code, response.json() if response.status_code == 200 else {}, address)
+
+
+@coalesced(normalize_address)
+def geocode_location(address):
+    # known cities are answered from the local gazetteer without a request
+    known = offline_geocode(address)
+    if known is not None:
+        return known
+
+    cached = geocode_cache.get(address)
+    if cached is not None:
+        if "error" in cached:
+            raise GeocodeNotFound(cached["error"])
+        return cached
+
+    response = http_client.get(GEOCODE_URL, params=geocode_params(address))
     try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
-    except Exception:
-        data = {}
+        geo = parse_geocode(response.status_code, response.json() if response.status_code == 200 else {}, address)
+    except GeocodeNotFound as e:
+        geocode_cache.put_negative(address, str(e))
+        raise
+    geocode_cache.put(address, geo)
+    return geo
+
+
+def weather_shape_order():
+    """Return the Google Weather request shapes in the order they should be tried.
+
+    GET with query parameters comes first unless POST with a JSON body is the
+    shape remembered in request_shapes as the one that returns data.
+    """
+    if request_shapes.preferred(WEATHER_URL) == "post":
+        return "post", "get"
+    return "get", "post"
+
 
-    # If the response lacks useful fields, try POSTing a JSON body as a fallback
-    if not any(k in data for k in ("dailyForecasts", "daily", "temperature", "currentConditions")):
+def weather_hedge_delay():
+    """HEDGE_DELAY while no shape is learned; None (plain sequential fallback) once one is.
+
+    Racing a learned shape against the other one would pay for the failing
+    request on every call.
+    """
+    return None if request_shapes.preferred(WEATHER_URL) else HEDGE_DELAY
+
+
+def accept_weather_shape(result):
+    return has_weather_fields(result[1])
+
+
+@location_cached(weather_cache, LOCATION_CACHE_GRID_KM, valid=has_weather_fields)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
+def get_weather(lat, lng):
+    def via_get():
         try:
-            body = {"location": {"latitude": lat, "longitude": lng}}
-            response = requests.post(url, params={"key": GOOGLE_MAPS_API_KEY}, json=body, timeout=10)
-            data = response.json()
+            response = http_client.get(WEATHER_URL, params=weather_get_params(lat, lng), timeout=10)
+            return "get", response.json()
         except Exception:
-            pass
+            return "get", {}
 
+    def via_post():
+        try:
+            response = http_client.post(WEATHER_URL, params={"key": GOOGLE_MAPS_API_KEY}, json=location_body(lat, lng), timeout=10)
+            return "post", response.json()
+        except Exception:
+            return "post", {}
+
+    # Try the shape that worked last time alone; if its response lacks useful
+    # fields, fall back to the other one. Both are raced (when hedging is
+    # enabled) only while no shape has been learned.
+    calls = {"get": via_get, "post": via_post}
+    first, second = weather_shape_order()
+    shape, data = hedged(calls[first], calls[second], accept_weather_shape, weather_hedge_delay())
+    if has_weather_fields(data):
+        request_shapes.record(WEATHER_URL, shape)
     return data
 
 
+@location_cached(air_quality_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
 def get_air_quality(lat, lng):
     """Get current air quality using Google Air Quality API."""
-    url = "https://airquality.googleapis.com/v1/currentConditions:lookup"
-    body = {"location": {"latitude": lat, "longitude": lng}}
     try:
-        response = requests.post(url, params={"key": GOOGLE_MAPS_API_KEY}, json=body, timeout=10)
+        response = http_client.post(AIR_QUALITY_URL, params={"key": GOOGLE_MAPS_API_KEY}, json=location_body(lat, lng), timeout=10)
         response.raise_for_status()  # Raise error for bad status codes
         data = response.json()
     except Exception as e:
@@ -148,6 +285,26 @@ def mask_needed(aqi):
     return aqi >= 101
 
 
+def travel_advice(daily, aqi):
+    """Compute clothing, umbrella and mask advice locally from forecast + AQI.
+
+    Returns a dict with avg_high (None without weather data), clothing,
+    umbrella and mask. Without weather data no umbrella is recommended, and
+    without an AQI no mask.
+    """
+    highs = [d["high"] for d in daily if d.get("high") is not None]
+    avg_high = sum(highs) / len(highs) if highs else None
+    if avg_high is not None:
+        clothing = clothing_recommendation(avg_high)
+    else:
+        clothing = "N/A (weather data unavailable)"
+    umbrella = any(d.get("precip", 0) is not None and umbrella_needed(d.get("precip", 0)) for d in daily)
+    if avg_high is None:
+        umbrella = False  # can't recommend umbrella without data
+    mask = mask_needed(aqi) if aqi is not None else False
+    return {"avg_high": avg_high, "clothing": clothing, "umbrella": umbrella, "mask": mask}
+
+
 def haversine(lat1, lon1, lat2, lon2):
     """Return distance in kilometers between two lat/lon pairs."""
     R = 6371.0
@@ -159,41 +316,54 @@ def haversine(lat1, lon1, lat2, lon2):
     return R * 2 * math.asin(math.sqrt(a))
 
 
+@coalesced()
 def get_attractions(city, lat, lng, radius_km=2, max_results=5):
     """Use Google Places Text Search to find tourist attractions in a city and return those within radius_km of (lat,lng)."""
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {"query": f"tourist attractions in {city}", "key": GOOGLE_MAPS_API_KEY}
-    response = requests.get(url, params=params)
-    data = response.json()
+    response = http_client.get(PLACES_URL, params=places_params(city))
+    return rank_attractions(response.json(), lat, lng, radius_km, max_results)
+
+
+def has_coordinates(loc):
+    return bool(loc) and loc.get("lat") is not None and loc.get("lng") is not None
+
+
+def rank_attractions(data, lat, lng, radius_km=2, max_results=5):
+    """Turn a Places Text Search reply into the closest attractions to (lat,lng).
+
+    Distances for all results are computed in one vectorized pass (geo.py) and
+    only the nearest max_results are selected.
+    """
+    # results without both coordinates cannot be ranked (and would give NaN distances)
+    results = [
+        r for r in data.get("results", [])
+        if has_coordinates((r.get("geometry") or {}).get("location"))
+    ]
+    if not results:
+        return []
+    locations = [r["geometry"]["location"] for r in results]
+    distances = np.round(haversine_many(
+        lat, lng, [loc["lat"] for loc in locations], [loc["lng"] for loc in locations]
+    ), 2)
+
+    # keep only those within radius_km, nearest first;
+    # if none found within radius, return the closest up to max_results
+    chosen = nearest(distances, max_results, within=radius_km)
+    if chosen.size == 0:
+        chosen = nearest(distances, max_results)
 
-    results = data.get("results", [])
     places = []
-    for r in results:
-        loc = r.get("geometry", {}).get("location")
-        if not loc:
-            continue
-        d = haversine(lat, lng, loc.get("lat"), loc.get("lng"))
+    for i in chosen:
+        r, loc = results[i], locations[i]
         place_type = r.get("types", [])
-        type_label = place_type[0] if place_type else "attraction"
-        addr = r.get("formatted_address") or r.get("vicinity") or ""
         places.append({
             "name": r.get("name"),
-            "address": addr,
+            "address": r.get("formatted_address") or r.get("vicinity") or "",
             "lat": loc.get("lat"),
             "lng": loc.get("lng"),
-            "distance_km": round(d, 2),
-            "type": type_label,
+            "distance_km": float(distances[i]),
+            "type": place_type[0] if place_type else "attraction",
         })
-
-    # keep only those within radius_km and sort by distance
-    filtered = [p for p in places if p["distance_km"] <= radius_km]
-    filtered.sort(key=lambda x: x["distance_km"]) 
-    # if none found within radius, return the closest up to max_results
-    if not filtered:
-        places.sort(key=lambda x: x["distance_km"])
-        return places[:max_results]
-
-    return filtered[:max_results]
+    return places
 
 
 def three_day_summary(weather_json):
@@ -230,18 +400,21 @@ def three_day_summary(weather_json):
 
 
 # OpenWeatherMap helpers (optional, used when OPENWEATHER_API_KEY is set)
+@location_cached(owm_forecast_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
 def get_owm_forecast(lat, lng, days=3):
     """Return a list of day dicts using OpenWeatherMap One Call API (metric units)."""
     if not OPENWEATHER_API_KEY:
         return None
-    url = "https://api.openweathermap.org/data/2.5/onecall"
-    params = {"lat": lat, "lon": lng, "exclude": "current,minutely,hourly,alerts", "units": "metric", "appid": OPENWEATHER_API_KEY}
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = http_client.get(OWM_FORECAST_URL, params=owm_forecast_params(lat, lng), timeout=10)
         data = r.json()
     except Exception:
         return None
+    return parse_owm_forecast(data, days)
+
 
+def parse_owm_forecast(data, days=3):
     res = []
     for d in data.get("daily", [])[:days]:
         high = d.get("temp", {}).get("max")
@@ -254,18 +427,21 @@ def get_owm_forecast(lat, lng, days=3):
     return res
 
 
+@location_cached(owm_air_quality_cache, LOCATION_CACHE_GRID_KM)
+@coalesced(location_key(LOCATION_CACHE_GRID_KM))
 def get_owm_air_quality(lat, lng):
     """Return a dict with OWM AQI index and a category/estimate."""
     if not OPENWEATHER_API_KEY:
         return None
-    url = "http://api.openweathermap.org/data/2.5/air_pollution"
-    params = {"lat": lat, "lon": lng, "appid": OPENWEATHER_API_KEY}
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = http_client.get(OWM_AIR_QUALITY_URL, params=owm_air_quality_params(lat, lng), timeout=10)
         data = r.json()
     except Exception:
         return None
+    return parse_owm_air_quality(data)
 
+
+def parse_owm_air_quality(data):
     try:
         idx = data["list"][0]["main"]["aqi"]  # 1..5
     except Exception:
@@ -281,3 +457,121 @@ def get_owm_air_quality(lat, lng):
     cat, est = mapping.get(idx, ("Unknown", None))
     return {"owm_index": idx, "category": cat, "aqi_estimate": est}
 
+
+
+
+def hedged(primary, backup, accept, delay=None):
+    """Call primary, falling back to backup, and return the first accepted result.
+
+    delay=None keeps the plain sequential fallback: backup only runs once
+    primary has returned something `accept` rejects. With a delay (0 means
+    immediately) backup is started after that many seconds if primary has not
+    produced an accepted result yet, and whichever accepted result arrives
+    first wins. A blocking HTTP call cannot be interrupted, so the losing
+    call is abandoned (not awaited) and its result discarded. If neither
+    result is accepted, backup's result is returned, as in the sequential case.
+    """
+    if delay is None:
+        result = primary()
+        return result if accept(result) else backup()
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        primary_future = pool.submit(primary)
+        done, _ = wait([primary_future], timeout=delay)
+        if done and primary_future.exception() is None and accept(primary_future.result()):
+            return primary_future.result()
+
+        backup_future = pool.submit(backup)
+        pending = {backup_future} if done else {primary_future, backup_future}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and accept(future.result()):
+                    return future.result()
+        if backup_future.exception() is None or primary_future.exception() is not None:
+            return backup_future.result()
+        return primary_future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def has_daily_data(daily):
+    return bool(daily) and any(d.get("high") is not None for d in daily)
+
+
+def get_daily_forecast(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return (daily, weather_json) for a location.
+
+    Prefers OpenWeatherMap when a key is configured and falls back to Google
+    Weather (hedged after hedge_delay seconds, see hedged()). weather_json is
+    the raw Google payload, or None when OWM answered.
+    """
+    def google():
+        weather = get_weather(lat, lng)
+        return three_day_summary(weather), weather
+
+    if not OPENWEATHER_API_KEY:
+        return google()
+    return hedged(lambda: (get_owm_forecast(lat, lng), None), google, lambda r: has_daily_data(r[0]), hedge_delay)
+
+
+def fetch_aqi(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return (aqi, source) for a location (OpenWeatherMap first, then Google)."""
+    def owm():
+        owm_aq = get_owm_air_quality(lat, lng)
+        if not owm_aq:
+            return None, "OpenWeatherMap"
+        return owm_aq.get("aqi_estimate") or owm_aq.get("owm_index"), "OpenWeatherMap"
+
+    def google():
+        return google_aqi(get_air_quality(lat, lng)), "Google Air Quality"
+
+    if not OPENWEATHER_API_KEY:
+        return google()
+    return hedged(owm, google, lambda r: r[0] is not None, hedge_delay)
+
+
+def get_aqi(lat, lng, hedge_delay=HEDGE_DELAY):
+    """Return a numeric AQI for a location (OpenWeatherMap first, then Google)."""
+    return fetch_aqi(lat, lng, hedge_delay)[0]
+
+
+def google_aqi(air):
+    """Extract AQI from a Google Air Quality reply, tolerating odd shapes."""
+    try:
+        return extract_aqi(air)
+    except Exception:
+        try:
+            return air["hourlyForecasts"][0]["indexes"][0]["aqi"]
+        except Exception:
+            return air.get("aqi", {}).get("value", None)
+
+
+def fetch_place_data(city, lat, lng, radius_km=2):
+    """Fetch attractions, forecast and AQI for a geocoded place in parallel.
+
+    The three lookups only depend on the coordinates, so they run
+    concurrently and cost roughly the slowest call.
+    """
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        attractions_future = pool.submit(get_attractions, city, lat, lng, radius_km=radius_km)
+        daily_future = pool.submit(get_daily_forecast, lat, lng)
+        aqi_future = pool.submit(get_aqi, lat, lng)
+        daily, weather = daily_future.result()
+        return {
+            "attractions": attractions_future.result(),
+            "daily": daily,
+            "aqi": aqi_future.result(),
+            "weather": weather,
+        }
+
+
+def fetch_city_bundle(city, radius_km=2):
+    """Geocode a city, then fetch attractions, forecast and AQI in parallel.
+
+    The city costs roughly geocode time plus the slowest downstream call.
+    """
+    geo = geocode_location(city)
+    lat, lng = geo["lat"], geo["lng"]
+    return {"lat": lat, "lng": lng, "address": geo.get("address", ""), **fetch_place_data(city, lat, lng, radius_km)}